@@ -1,17 +1,30 @@
 import os
-import subprocess
+import json
+import sqlite3
+import re
+import select
+import codecs
+import signal
+import itertools
 import threading
 import asyncio
 import logging
 import queue
 import zipfile
-import io
-import shutil
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
-from flask_socketio import SocketIO, emit
+import time
+import zlib
+import multiprocessing
+import concurrent.futures
+from collections import deque
+from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, Response, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from functools import wraps
 from pyrogram import Client, filters
 from pyrogram.types import Message
+from ptyprocess import PtyProcess
+from modules.metrics import REGISTRY, LoopLagMonitor, render, with_labels
+from modules.reply_state import get_reply_state_store
+from modules.session_archive import stream_zip, stage_sessions, commit_staged, discard_staged
 
 
 logging.basicConfig(level=logging.INFO)
@@ -25,9 +38,51 @@ logging.info(f"✅ Using port: {port}")
 
 ADMIN_PASSWORD = ""
 
-active_processes = {}
+# Number of worker processes bot managers are sharded across (0 = run every bot in this process)
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0"))
+
+# Terminal lines are merged per room and flushed at this interval; each room buffers at most this many lines
+TERMINAL_FLUSH_INTERVAL = float(os.environ.get("TERMINAL_FLUSH_MS", "50")) / 1000
+TERMINAL_ROOM_BACKLOG = int(os.environ.get("TERMINAL_ROOM_BACKLOG", "500"))
+
+# Resume every saved session on boot, at most RESUME_CONCURRENCY logins at once, RESUME_STAGGER_MS apart
+AUTO_RESUME = os.environ.get("AUTO_RESUME", "").lower() in ("1", "true", "yes")
+RESUME_CONCURRENCY = int(os.environ.get("RESUME_CONCURRENCY", "8"))
+RESUME_STAGGER = float(os.environ.get("RESUME_STAGGER_MS", "200")) / 1000
+
+SESSION_DIR = 'session'
+# Default deflate level for session exports (0 stores entries uncompressed)
+SESSION_EXPORT_LEVEL = int(os.environ.get("SESSION_EXPORT_LEVEL", "6"))
+# The admin session list is rebuilt at least this often even when the directory itself did not change
+SESSION_CATALOG_TTL = float(os.environ.get("SESSION_CATALOG_TTL", "30"))
+# Credentials needed to reopen a session are kept next to it in <session_name>.bot.json
+BOT_SIDECAR_SUFFIX = '.bot.json'
+
+# Shards push a metrics snapshot to the supervisor this often; METRICS_TOKEN, when set, guards /metrics
+METRICS_PUSH_INTERVAL = float(os.environ.get("METRICS_PUSH_INTERVAL", "10"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Web terminal commands run on a PTY read in TERMINAL_CHUNK_BYTES chunks; a frame is sent every flush interval or
+# once TERMINAL_FRAME_BYTES are pending. Each session keeps TERMINAL_SCROLLBACK_BYTES of output for reconnects and
+# stops reading while more than TERMINAL_MAX_INFLIGHT frames are unacknowledged (for up to TERMINAL_ACK_TIMEOUT s)
+TERMINAL_CHUNK_BYTES = int(os.environ.get("TERMINAL_CHUNK_BYTES", "4096"))
+TERMINAL_FRAME_BYTES = int(os.environ.get("TERMINAL_FRAME_BYTES", "16384"))
+TERMINAL_SCROLLBACK_BYTES = int(os.environ.get("TERMINAL_SCROLLBACK_BYTES", str(256 * 1024)))
+TERMINAL_MAX_INFLIGHT = int(os.environ.get("TERMINAL_MAX_INFLIGHT", "8"))
+TERMINAL_ACK_TIMEOUT = float(os.environ.get("TERMINAL_ACK_TIMEOUT", "10"))
+TERMINAL_SESSION_TTL = float(os.environ.get("TERMINAL_SESSION_TTL", "3600"))
+
+# Terminal commands share a pool of TERMINAL_MAX_JOBS workers, at most TERMINAL_MAX_SESSION_JOBS per session at a
+# time; each session may queue up to TERMINAL_MAX_QUEUED more
+TERMINAL_MAX_JOBS = int(os.environ.get("TERMINAL_MAX_JOBS", "4"))
+TERMINAL_MAX_SESSION_JOBS = int(os.environ.get("TERMINAL_MAX_SESSION_JOBS", "2"))
+TERMINAL_MAX_QUEUED = int(os.environ.get("TERMINAL_MAX_QUEUED", "16"))
+
 active_bots = {}
 
+loop_lag = LoopLagMonitor()
+REGISTRY.register_collector(loop_lag.collect)
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -38,6 +93,10 @@ def admin_required(f):
 
 @app.after_request
 def add_header(response):
+    if 'ETag' in response.headers:
+        # Let clients revalidate ETagged snapshots instead of refetching them
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -69,15 +128,378 @@ def stream_tutorial_video():
 def handle_connect():
     print('Client connected')
     emit('output', {'data': '🚀 Web Terminal Connected! Use the forms to manage the Telegram Bot.\n'})
+    version, status_list = status_board.snapshot()
+    emit('bot_status_snapshot', {'bots': status_list, 'version': version})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
+    detach_terminal(request.sid)
+
+def bot_room(bot_id):
+    """Socket.IO room that receives one bot's terminal output."""
+    return f"bot:{bot_id}"
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    bot_id = (data or {}).get('bot_id')
+    if bot_id:
+        join_room(bot_room(bot_id))
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    bot_id = (data or {}).get('bot_id')
+    if bot_id:
+        leave_room(bot_room(bot_id))
+
+class TerminalSession:
+    """Scrollback ring buffer and frame acknowledgements for one browser tab's terminal, keyed by its token."""
+    def __init__(self, token, server):
+        self.token = token
+        self.server = server
+        self.room = f"term:{token}"
+        self.scrollback = deque()
+        self.scrollback_bytes = 0
+        self.seq = 0
+        self.acked = 0
+        self.attached = 0
+        self.jobs = {}
+        self.last_active = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def idle(self):
+        return not self.attached and not self.jobs
+
+    def attach(self, after=0):
+        """Register a connected client; returns the frames it has not seen yet."""
+        with self._cond:
+            self.attached += 1
+            self.acked = self.seq
+            frames = [(seq, text) for seq, text in self.scrollback if seq > after]
+            truncated = bool(self.scrollback) and self.scrollback[0][0] > after + 1 and after < self.seq
+            return frames, truncated
+
+    def detach(self):
+        with self._cond:
+            self.attached = max(0, self.attached - 1)
+            self.last_active = time.monotonic()
+            self._cond.notify_all()
+
+    def ack(self, seq):
+        with self._cond:
+            if seq > self.acked:
+                self.acked = min(seq, self.seq)
+                self._cond.notify_all()
+
+    def write(self, text, wait=False):
+        """Append a frame; with wait (PTY readers only) first block while too many frames are unacknowledged."""
+        if not text:
+            return
+        with self._cond:
+            deadline = time.monotonic() + TERMINAL_ACK_TIMEOUT
+            while wait and self.attached and self.seq - self.acked >= TERMINAL_MAX_INFLIGHT:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # The client stopped acknowledging; keep buffering and let it catch up on reconnect
+                    logging.warning(f"Terminal {self.token[:8]} is not acknowledging output - no longer waiting")
+                    self.acked = self.seq
+                    break
+                self._cond.wait(remaining)
+
+            self.seq += 1
+            self.scrollback.append((self.seq, text))
+            self.scrollback_bytes += len(text)
+            while self.scrollback_bytes > TERMINAL_SCROLLBACK_BYTES and len(self.scrollback) > 1:
+                _, dropped = self.scrollback.popleft()
+                self.scrollback_bytes -= len(dropped)
+            if self.attached:
+                self.server.emit('output', {'data': text, 'seq': self.seq}, room=self.room)
+
+
+terminal_sessions = {}
+terminal_sessions_lock = threading.Lock()
+terminal_sids = {}
+
+_TERMINAL_TOKEN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def terminal_session_for(sid):
+    """The terminal session a Socket.IO client is attached to (its own sid when it never attached)."""
+    token = terminal_sids.get(sid, sid)
+    with terminal_sessions_lock:
+        session_ = terminal_sessions.get(token)
+        if session_ is None:
+            # Forget sessions nobody has come back to for a while
+            cutoff = time.monotonic() - TERMINAL_SESSION_TTL
+            for key in [key for key, old in terminal_sessions.items() if old.idle and old.last_active < cutoff]:
+                del terminal_sessions[key]
+            session_ = terminal_sessions[token] = TerminalSession(token, socketio)
+    return session_
+
+
+@socketio.on('terminal_attach')
+def handle_terminal_attach(data):
+    data = data or {}
+    token = str(data.get('token') or '')
+    if not _TERMINAL_TOKEN.match(token):
+        return
+    previous = terminal_sids.get(request.sid)
+    if previous is not None:
+        terminal_session_for(request.sid).detach()
+        leave_room(f"term:{previous}")
+    terminal_sids[request.sid] = token
+    session_ = terminal_session_for(request.sid)
+    join_room(session_.room)
+    frames, truncated = session_.attach(int(data.get('after') or 0))
+    if frames:
+        text = ''.join(text for _, text in frames)
+        if truncated:
+            text = '[… earlier output no longer in scrollback …]\n' + text
+        emit('terminal_replay', {'data': text, 'seq': frames[-1][0]})
+    emit('terminal_jobs', {'jobs': terminal_jobs.snapshot(session_)})
+
+@socketio.on('terminal_ack')
+def handle_terminal_ack(data):
+    token = terminal_sids.get(request.sid)
+    if token is not None:
+        terminal_session_for(request.sid).ack(int((data or {}).get('seq') or 0))
+
+def detach_terminal(sid):
+    token = terminal_sids.pop(sid, None)
+    if token is not None:
+        with terminal_sessions_lock:
+            session_ = terminal_sessions.get(token)
+        if session_ is not None:
+            session_.detach()
+
+
+def run_pty_command(job):
+    """Run a job's command on a PTY, streaming its output to the job's terminal in chunked, time/size-flushed frames."""
+    terminal = job.terminal
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = []
+    pending_bytes = 0
+    try:
+        process = PtyProcess.spawn(['/bin/sh', '-c', job.command], dimensions=(40, 120))
+        job.started(process)
+        next_flush = time.monotonic() + TERMINAL_FLUSH_INTERVAL
+        while True:
+            ready, _, _ = select.select([process.fd], [], [], max(0.0, next_flush - time.monotonic()))
+            if ready:
+                try:
+                    chunk = os.read(process.fd, TERMINAL_CHUNK_BYTES)
+                except OSError:
+                    # EIO once the child side of the PTY is closed
+                    chunk = b''
+                if not chunk:
+                    break
+                pending.append(chunk)
+                pending_bytes += len(chunk)
+            now = time.monotonic()
+            if pending and (pending_bytes >= TERMINAL_FRAME_BYTES or now >= next_flush):
+                terminal.write(decoder.decode(b''.join(pending)), wait=True)
+                pending.clear()
+                pending_bytes = 0
+            if now >= next_flush:
+                next_flush = now + TERMINAL_FLUSH_INTERVAL
+
+        terminal.write(decoder.decode(b''.join(pending), final=True), wait=True)
+        process.wait()
+        return_code = process.exitstatus if process.exitstatus is not None else -(process.signalstatus or 1)
+        job.return_code = return_code
+        if return_code == 0:
+            terminal.write(f'\n✅ [job {job.id}] Command executed successfully\n')
+        else:
+            terminal.write(f'\n❌ [job {job.id}] Command failed with return code {return_code}\n')
+
+    except Exception as e:
+        terminal.write(f'\n💥 [job {job.id}] Error running command: {str(e)}\n')
+
+    finally:
+        if job.process is not None:
+            job.process.close(force=True)
+
+
+class TerminalJob:
+    def __init__(self, job_id, terminal, command):
+        self.id = job_id
+        self.terminal = terminal
+        self.command = command
+        self.state = "queued"
+        self.process = None
+        self.return_code = None
+        self.pending_signal = None
+        self._lock = threading.Lock()
+
+    def started(self, process):
+        """Record the spawned process and deliver a signal that arrived before it existed."""
+        with self._lock:
+            self.process = process
+            pending, self.pending_signal = self.pending_signal, None
+        if pending is not None:
+            self._killpg(pending)
+
+    def send_signal(self, sig):
+        """Signal the job's process group ("sent"), keep sig for started() ("pending"), or None once it exited."""
+        with self._lock:
+            if self.process is None:
+                # A kill asked for earlier is not downgraded by a later Ctrl+C
+                if self.pending_signal != signal.SIGKILL:
+                    self.pending_signal = sig
+                return "pending"
+            process = self.process
+        if not process.isalive():
+            return None
+        if sig == signal.SIGINT:
+            # Ctrl+C through the PTY reaches the whole foreground process group
+            process.sendintr()
+        else:
+            self._killpg(sig)
+        return "sent"
+
+    def _killpg(self, sig):
+        # PtyProcess.spawn runs the shell in a new session (setsid), so its pid is also the id of a process
+        # group holding everything the command started; signalling only the shell would orphan pipelines
+        try:
+            os.killpg(self.process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def describe(self, position=None):
+        return {"id": self.id, "command": self.command, "state": self.state,
+                "position": position, "return_code": self.return_code}
+
+
+class TerminalJobRunner:
+    """Runs web-terminal commands, max_jobs at once and max_session_jobs per session; the rest wait in a FIFO queue."""
+    def __init__(self, max_jobs=TERMINAL_MAX_JOBS, max_session_jobs=TERMINAL_MAX_SESSION_JOBS,
+                 max_queued=TERMINAL_MAX_QUEUED):
+        self.max_jobs = max_jobs
+        self.max_session_jobs = max_session_jobs
+        self.max_queued = max_queued
+        self.queue = deque()
+        self.running = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='terminal-job')
+
+    def submit(self, terminal, command):
+        """Queue command for terminal; returns the job, or None when the session's queue is full."""
+        with self._lock:
+            if sum(1 for job in self.queue if job.terminal is terminal) >= self.max_queued:
+                return None
+            job = TerminalJob(next(self._ids), terminal, command)
+            terminal.jobs[job.id] = job
+            self.queue.append(job)
+            started = self._dispatch()
+            position = self._position(job)
+        if position is not None:
+            terminal.write(f'⏳ [job {job.id}] Queued at position {position}: {command}\n')
+        self._announce(started, terminal)
+        return job
+
+    def interrupt(self, terminal, job_id=None):
+        """Ctrl+C one job (every running job of the session when job_id is None); a queued job is dropped instead."""
+        with self._lock:
+            if job_id is None:
+                jobs = [job for job in terminal.jobs.values() if job.state == "running"]
+            else:
+                jobs = [terminal.jobs[job_id]] if job_id in terminal.jobs else []
+            cancelled = [job for job in jobs if job.state == "queued"]
+            for job in cancelled:
+                self.queue.remove(job)
+                job.state = "cancelled"
+                del terminal.jobs[job.id]
+        for job in cancelled:
+            terminal.write(f'\n🚫 [job {job.id}] Removed from queue\n')
+        for job in jobs:
+            if job.state != "running":
+                continue
+            outcome = job.send_signal(signal.SIGINT)
+            if outcome == "sent":
+                terminal.write(f'\n🛑 [job {job.id}] Process interrupted\n')
+            elif outcome == "pending":
+                terminal.write(f'\n🛑 [job {job.id}] Not started yet - it will be interrupted as soon as it starts\n')
+        self._announce([], terminal)
+        return bool(jobs)
+
+    def kill(self, terminal, job_id):
+        job = terminal.jobs.get(job_id)
+        if job is None:
+            return False
+        if job.state == "queued":
+            return self.interrupt(terminal, job_id)
+        outcome = job.send_signal(signal.SIGKILL)
+        if outcome == "sent":
+            terminal.write(f'\n☠️ [job {job.id}] Process killed\n')
+        elif outcome == "pending":
+            terminal.write(f'\n☠️ [job {job.id}] Not started yet - it will be killed as soon as it starts\n')
+        return True
+
+    def snapshot(self, terminal):
+        with self._lock:
+            return [job.describe(self._position(job)) for job in terminal.jobs.values()]
+
+    def _position(self, job):
+        if job.state != "queued":
+            return None
+        for index, queued in enumerate(self.queue, 1):
+            if queued is job:
+                return index
+        return None
+
+    def _dispatch(self):
+        """Start queued jobs while there is capacity; caller holds the lock. Returns the jobs started."""
+        started = []
+        for job in list(self.queue):
+            if self.running >= self.max_jobs:
+                break
+            running_here = sum(1 for other in job.terminal.jobs.values() if other.state == "running")
+            if running_here >= self.max_session_jobs:
+                continue
+            self.queue.remove(job)
+            job.state = "running"
+            self.running += 1
+            started.append(job)
+            self._pool.submit(self._run, job)
+        return started
+
+    def _run(self, job):
+        job.terminal.write(f'▶️ [job {job.id}] $ {job.command}\n')
+        try:
+            run_pty_command(job)
+        finally:
+            with self._lock:
+                job.state = "done" if job.return_code == 0 else "failed"
+                job.terminal.jobs.pop(job.id, None)
+                job.terminal.last_active = time.monotonic()
+                self.running -= 1
+                started = self._dispatch()
+            self._announce(started, job.terminal, finished=job)
+
+    def _announce(self, started, terminal, finished=None):
+        """Push fresh job lists (with queue positions) to every session whose view changed."""
+        terminals = {id(terminal): terminal}
+        for job in started:
+            terminals[id(job.terminal)] = job.terminal
+        with self._lock:
+            for job in self.queue:
+                terminals[id(job.terminal)] = job.terminal
+        for term in terminals.values():
+            jobs = self.snapshot(term)
+            if finished is not None and term is finished.terminal:
+                jobs.append(finished.describe())
+            socketio.emit('terminal_jobs', {'jobs': jobs}, room=term.room)
+
+
+terminal_jobs = TerminalJobRunner()
+
 
 @socketio.on('execute')
 def handle_execute(data):
     command = data['command']
-    session_id = request.sid
+    terminal = terminal_session_for(request.sid)
     
     # Handle simple internal commands
     if command.lower() == 'help':
@@ -85,58 +507,58 @@ def handle_execute(data):
 Available Terminal Commands:
 ----------------------------
 help        - Show this help message.
+jobs        - List this terminal's running and queued jobs.
 ls, pwd, etc. - Executes basic shell commands (output will be shown here).
 """
-        socketio.emit('output', {'data': help_text}, room=session_id)
+        terminal.write(f'\n$ {command}\n{help_text}')
+        return
+
+    if command.lower() == 'jobs':
+        jobs = terminal_jobs.snapshot(terminal)
+        lines = [f"[job {job['id']}] {job['state']}" + (f" (position {job['position']})" if job['position'] else '') +
+                 f": {job['command']}" for job in jobs]
+        terminal.write(f'\n$ {command}\n' + ('\n'.join(lines) if lines else 'No jobs') + '\n')
         return
 
     print(f'Executing command: {command}')
-    
-    def send_output(data):
-        socketio.emit('output', {'data': data}, room=session_id)
-    def run_command(cmd, sid):
-        try:
-            process = subprocess.Popen(
-                cmd, 
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            active_processes[sid] = process
-            
-            for line in iter(process.stdout.readline, ''):
-                if not line:
-                    break
-                send_output(line)
-                
-            process.stdout.close()
-            return_code = process.wait()
-            
-            if return_code == 0:
-                send_output('\n✅ Command executed successfully\n')
-            else:
-                send_output(f'\n❌ Command failed with return code {return_code}\n')
-                
-        except Exception as e:
-            send_output(f'\n💥 Error running command: {str(e)}\n')
-            
-        finally:
-            if sid in active_processes:
-                del active_processes[sid]
+    if terminal_jobs.submit(terminal, command) is None:
+        terminal.write('\n⚠️ Too many queued commands in this terminal - try again when some finish\n')
+
 
-    threading.Thread(target=run_command, args=(command, session_id), daemon=True).start()
+def parse_job_id(terminal, data):
+    """Return the job id sent with a socket event, writing an error to the terminal (and returning None) if invalid."""
+    job_id = (data or {}).get('job_id') if isinstance(data, dict) else None
+    try:
+        return int(job_id)
+    except (TypeError, ValueError):
+        terminal.write(f'\n⚠️ Invalid job id: {job_id!r}\n')
+        return None
 
 
 @socketio.on('interrupt')
-def handle_interrupt():
-    session_id = request.sid
-    if session_id in active_processes:
-        active_processes[session_id].terminate()
-        emit('output', {'data': '\n🛑 Process interrupted\n'})
+def handle_interrupt(data=None):
+    terminal = terminal_session_for(request.sid)
+    if not isinstance(data, dict) or data.get('job_id') is None:
+        # Plain Ctrl+C: every running job of this terminal
+        terminal_jobs.interrupt(terminal)
+        return
+    job_id = parse_job_id(terminal, data)
+    if job_id is not None and not terminal_jobs.interrupt(terminal, job_id):
+        terminal.write(f'\n⚠️ No job {job_id} in this terminal\n')
+
+
+@socketio.on('kill_job')
+def handle_kill_job(data):
+    terminal = terminal_session_for(request.sid)
+    job_id = parse_job_id(terminal, data)
+    if job_id is not None and not terminal_jobs.kill(terminal, job_id):
+        terminal.write(f'\n⚠️ No job {job_id} in this terminal\n')
+
+
+@socketio.on('list_jobs')
+def handle_list_jobs():
+    emit('terminal_jobs', {'jobs': terminal_jobs.snapshot(terminal_session_for(request.sid))})
+
 
 _async_loop = None
 _async_thread = None
@@ -148,23 +570,169 @@ def get_async_loop():
         _async_loop = asyncio.new_event_loop()
         _async_thread = threading.Thread(target=_async_loop.run_forever, daemon=True)
         _async_thread.start()
+        loop_lag.start(_async_loop)
         logging.info("Created persistent event loop for async operations")
     return _async_loop
 
+class TerminalFeed:
+    """
+    Coalesces terminal lines per Socket.IO room and emits them as one
+    frame per room every flush interval from a background thread.
+    write() never blocks: when a room's backlog is full, new lines are
+    dropped and a summary line is sent in their place.
+    """
+    def __init__(self, server, interval=TERMINAL_FLUSH_INTERVAL, backlog=TERMINAL_ROOM_BACKLOG):
+        self.server = server
+        self.interval = interval
+        self.backlog = backlog
+        self._pending = {}
+        self._dropped = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run, name="terminal-feed", daemon=True).start()
+
+    def write(self, room, text):
+        with self._lock:
+            lines = self._pending.get(room)
+            if lines is None:
+                lines = self._pending[room] = deque()
+            if len(lines) >= self.backlog:
+                self._dropped[room] = self._dropped.get(room, 0) + 1
+                return
+            lines.append(text)
+            self._ready.set()
+
+    def _run(self):
+        while True:
+            self._ready.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                pending, dropped = self._pending, self._dropped
+                self._pending, self._dropped = {}, {}
+                self._ready.clear()
+            for room, lines in pending.items():
+                data = ''.join(lines)
+                if dropped.get(room):
+                    data += f"⚠️ {dropped[room]} terminal line(s) dropped under load\n"
+                try:
+                    self.server.emit('output', {'data': data}, room=room)
+                except Exception as e:
+                    logging.error(f"Terminal feed emit failed: {e}")
+
+
+class BotTerminal:
+    """Socket.IO stand-in handed to a bot's modules: terminal output goes to the bot's room via the feed."""
+    def __init__(self, feed, server, room):
+        self.feed = feed
+        self.server = server
+        self.room = room
+
+    def emit(self, event, data=None, room=None, **kwargs):
+        if event == 'output' and room is None:
+            self.feed.write(self.room, data['data'])
+        else:
+            self.server.emit(event, data, room=room, **kwargs)
+
+
+class BotStatusBoard:
+    """Every bot's status; updates publish only the changed fields, and the versioned board is the status ETag."""
+    def __init__(self, server):
+        self.server = server
+        self.boot_id = os.urandom(6).hex()
+        self.version = 0
+        self._bots = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, bot_id):
+        return bot_id in self._bots
+
+    def update(self, bot_id, entry):
+        with self._lock:
+            previous = self._bots.get(bot_id, {})
+            changes = {key: value for key, value in entry.items() if previous.get(key) != value}
+            if not changes:
+                return
+            self._bots[bot_id] = dict(entry)
+            self.version += 1
+            version = self.version
+        self.server.emit('bot_status', {"bot_id": bot_id, "changes": changes, "version": version})
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, list(self._bots.values())
+
+
+status_board = BotStatusBoard(socketio)
+
+terminal_feed = None
+
+def get_terminal_feed():
+    """Return this process's terminal feed for the real Socket.IO server."""
+    global terminal_feed
+    if terminal_feed is None:
+        terminal_feed = TerminalFeed(socketio)
+    return terminal_feed
+
+
+AUTH_FRESH = "fresh"
+AUTH_AUTHORIZED = "authorized"
+AUTH_AWAITING_CODE = "awaiting_code"
+AUTH_AWAITING_PASSWORD = "awaiting_password"
+AUTH_RUNNING = "running"
+
+
+def session_name_for(phone_number):
+    """Pyrogram session name (file stem under SESSION_DIR) used for an account."""
+    return f"session_{phone_number.replace('+', '')}"
+
+
+def session_auth_state(path):
+    """Read a Pyrogram session file and report whether it already holds an authorized login."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return AUTH_FRESH
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT auth_key, user_id FROM sessions").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning(f"Could not inspect session file {path}: {e}")
+        return AUTH_FRESH
+    if row and row[0] and row[1]:
+        return AUTH_AUTHORIZED
+    return AUTH_FRESH
+
+
 class TelegramBotManager:
     """Manages a Pyrogram Client instance and feature modules."""
-    def __init__(self, api_id, api_hash, phone_number):
+    def __init__(self, api_id, api_hash, phone_number, socketio_server=None, loop=None, feed=None, status_sink=None):
         self.api_id = api_id
         self.api_hash = api_hash
         self.phone_number = phone_number
-        self.session_name = f"session_{phone_number.replace('+', '')}"
+        self.bot_id = f"{phone_number}_{api_id}"
+        self.session_name = session_name_for(phone_number)
         self.client = None
         self.is_running = False
         self.phone_code_hash = None
         self.awaiting_code = False
         self.awaiting_password = False
-        self.loop = get_async_loop() 
+        self.state = "stopped"
+        self.last_error = None
+        self.operation = None
+        self.auth_timings = {}
+        self._operation_lock = None
+        self._pending_operations = {}
+        self._pending_operations_lock = threading.Lock()
+        self.status_sink = status_sink or status_board.update
+        self.socketio = socketio_server or socketio
+        self.terminal = BotTerminal(feed or get_terminal_feed(), self.socketio, bot_room(self.bot_id))
+        self.loop = loop or get_async_loop()
         self.modules = []
+        self.conversation = None
+        self.outbound = None
+        self.sent = None
+        self.router = None
         self.user_info = {
             "username": None,
             "first_name": None,
@@ -181,6 +749,68 @@ class TelegramBotManager:
             "user_id": me.id
         }
     
+    def set_state(self, state, error=None):
+        """Record a lifecycle state change and publish the bot's status."""
+        self.state = state
+        self.last_error = error
+        self.status_sink(self.bot_id, bot_status_entry(self.bot_id, self))
+
+    def set_operation(self, name, state, result=None):
+        self.operation = {"name": name, "state": state, "result": result}
+        self.status_sink(self.bot_id, bot_status_entry(self.bot_id, self))
+
+    def submit_operation(self, task_name, verification_code=None, password=None):
+        """
+        Schedule a lifecycle operation on the bot's event loop without
+        blocking the caller. Operations on one bot run one at a time, and
+        an identical request that is still queued or running is coalesced
+        into the existing one. Returns (future, coalesced).
+        """
+        key = (task_name, verification_code, password)
+        with self._pending_operations_lock:
+            future = self._pending_operations.get(key)
+            if future is not None and not future.done():
+                return future, True
+            future = asyncio.run_coroutine_threadsafe(
+                self._run_operation(task_name, verification_code, password), self.loop)
+            self._pending_operations[key] = future
+        future.add_done_callback(lambda done: self._operation_finished(key, task_name, done))
+        return future, False
+
+    async def _run_operation(self, task_name, verification_code=None, password=None):
+        if self._operation_lock is None:
+            self._operation_lock = asyncio.Lock()
+        self.set_operation(task_name, "queued")
+        async with self._operation_lock:
+            self.set_operation(task_name, "running")
+            if task_name == 'start':
+                result = await self.start_bot(verification_code=verification_code, password=password)
+            elif task_name == 'resume':
+                result = await self.start_bot(resume=True)
+            elif task_name == 'stop':
+                result = await self.stop_bot()
+            elif task_name == 'reload':
+                result = await self.reload_session()
+            else:
+                logging.error(f"Invalid task: {task_name}")
+                result = {"status": "error", "message": "Invalid task"}
+        self.set_operation(task_name, "failed" if result["status"] == "error" else "done", result["status"])
+        return result
+
+    def _operation_finished(self, key, task_name, future):
+        with self._pending_operations_lock:
+            if self._pending_operations.get(key) is future:
+                del self._pending_operations[key]
+        try:
+            result = future.result()
+            logging.info(f"Task {task_name} completed with result: {result}")
+        except Exception as e:
+            error_msg = f"Operation exception: {type(e).__name__}: {str(e)}"
+            logging.error(f"Error in {task_name} task: {error_msg}", exc_info=e)
+            self.set_operation(task_name, "failed", "error")
+            result = {"status": "error", "message": error_msg}
+        self.socketio.emit('bot_management_result', result)
+
     async def initialize_bot(self):
         """Initializes the Pyrogram client."""
         self.client = Client(
@@ -197,21 +827,37 @@ class TelegramBotManager:
         from modules.smart_auto_reply import SmartAutoReplyModule
         from modules.gemini_ai import GeminiAIModule
         from modules.start import StartCommandModule
+        from modules.conversation_service import ConversationService
+        from modules.outbound import OutboundDispatcher
+        from modules.command_router import CommandRouter
+        from modules.sent_messages import SentMessages
+        
+        # One conversation engine per bot, shared by every module
+        self.conversation = ConversationService(self.session_name)
+        # One paced outbound queue per account, shared by every module
+        self.outbound = OutboundDispatcher.from_env()
+        # Incoming private text is parsed once and dispatched to exactly one module handler
+        self.router = CommandRouter(self.client)
+        # The bot's own sends from every module, so none of them is taken for a manual reply
+        self.sent = SentMessages()
         
         # Load Start Command module first (highest priority)
-        start_cmd = StartCommandModule(self.client, socketio)
+        start_cmd = StartCommandModule(self.client, self.terminal, self.conversation, self.outbound, self.router,
+                                       self.sent)
         start_cmd.setup()
         self.modules.append(start_cmd)
         logging.info(f"✅ Loaded module: {start_cmd.name}")
         
         # Load Gemini AI module (for /gem command)
-        gemini_ai = GeminiAIModule(self.client, socketio)
+        gemini_ai = GeminiAIModule(self.client, self.terminal, self.conversation, self.outbound, self.router,
+                                   self.sent)
         gemini_ai.setup()
         self.modules.append(gemini_ai)
         logging.info(f"✅ Loaded module: {gemini_ai.name}")
         
         # Load Smart Auto Reply module last (handles online/offline + conversation mode)
-        smart_auto_reply = SmartAutoReplyModule(self.client, socketio)
+        smart_auto_reply = SmartAutoReplyModule(self.client, self.terminal, self.conversation, self.outbound, self.router,
+                                                self.sent)
         smart_auto_reply.setup()
         self.modules.append(smart_auto_reply)
         logging.info(f"✅ Loaded module: {smart_auto_reply.name}")
@@ -226,91 +872,149 @@ class TelegramBotManager:
             except Exception as e:
                 logging.error(f"Error unloading module {module.name}: {e}")
         self.modules.clear()
+        if self.conversation is not None:
+            self.conversation.close()
+            self.conversation = None
+        if self.outbound is not None:
+            self.outbound.close()
+            self.outbound = None
+        self.router = None
+        self.sent = None
     
-    async def start_bot(self, verification_code=None, password=None):
-        """Starts the Pyrogram client using start() method."""
-        from pyrogram.errors import SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired
+    @property
+    def sidecar_path(self):
+        return os.path.join(SESSION_DIR, self.session_name + BOT_SIDECAR_SUFFIX)
+
+    def save_credentials(self):
+        """Store what is needed to reopen this session without the login form."""
+        record = {"api_id": str(self.api_id), "api_hash": self.api_hash, "phone_number": self.phone_number}
+        tmp_path = self.sidecar_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self.sidecar_path)
+        except OSError as e:
+            logging.error(f"Failed to save credentials for {self.session_name}: {e}")
+
+    def forget_credentials(self):
+        try:
+            os.remove(self.sidecar_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Failed to remove credentials for {self.session_name}: {e}")
+
+    async def start_bot(self, verification_code=None, password=None, resume=False):
+        """Starts the bot and publishes the resulting lifecycle state."""
+        self.set_state("starting")
+        result = await self._start_bot(verification_code=verification_code, password=password, resume=resume)
+        if result["status"] == "success":
+            self.save_credentials()
+            self.set_state("running")
+        elif result["status"] == "code_sent":
+            self.set_state("awaiting_code")
+        elif result["status"] == "password_required":
+            self.set_state("awaiting_password")
+        else:
+            self.set_state("error", result.get("message"))
+        return result
+
+    def auth_state(self):
+        """Where this account is in the login flow, decided without touching the network."""
+        if self.is_running and self.client and self.client.is_connected:
+            return AUTH_RUNNING
+        if self.awaiting_password:
+            return AUTH_AWAITING_PASSWORD
+        if self.phone_code_hash:
+            return AUTH_AWAITING_CODE
+        return session_auth_state(os.path.join(SESSION_DIR, self.session_name + '.session'))
+
+    async def _step(self, name, awaitable):
+        """Await one login step, recording how long it took."""
+        started = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.auth_timings[name] = round(time.monotonic() - started, 3)
+
+    async def _go_live(self, me):
+        """Finish a login: remember who we are and attach the feature modules."""
+        self.is_running = True
+        self.update_user_info(me)
+        self.load_modules()
+        logging.info("✅ Bot is now actively running and listening for messages")
+        return {
+            "status": "success",
+            "message": f"✅ Bot started successfully as @{me.username if me.username else me.first_name} (ID: {me.id})"
+        }
+
+    async def _send_code(self):
+        if not self.client.is_connected:
+            await self._step("connect", self.client.connect())
+        logging.info(f"Sending verification code to {self.phone_number}")
+        sent_code = await self._step("send_code", self.client.send_code(self.phone_number))
+        self.phone_code_hash = sent_code.phone_code_hash
+        self.awaiting_code = True
+        return {
+            "status": "code_sent",
+            "message": f"📱 Verification code sent to {self.phone_number}. Please enter the code."
+        }
+
+    async def _start_bot(self, verification_code=None, password=None, resume=False):
+        """
+        Drive the login state machine one step:
+
+        running            -> nothing to do
+        authorized session -> start() (connect + updates + get_me), go live
+        fresh session      -> connect, send_code, wait for the code
+        awaiting code      -> sign_in, go live (or wait for the 2FA password)
+        awaiting password  -> check_password, go live
+        """
+        from pyrogram.errors import SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired, Unauthorized
         
+        self.auth_timings = {}
+        started = time.monotonic()
         try:
-            if self.is_running and self.client:
-                try:
-                    me = await self.client.get_me()
-                    self.update_user_info(me)
-                    return {"status": "success", "message": f"✅ Bot is already running as {me.first_name}"}
-                except:
-                    self.is_running = False
+            state = self.auth_state()
+            logging.info(f"Auth state for {self.phone_number}: {state}")
+
+            if state == AUTH_RUNNING:
+                return {"status": "success", "message": f"✅ Bot is already running as {self.user_info.get('first_name')}"}
 
             if not self.client:
                 await self.initialize_bot()
 
-            try:
-                await self.client.start()
-                self.is_running = True
-                me = await self.client.get_me()
-                self.update_user_info(me)
-                
-                self.load_modules()
-                
-                logging.info(f"✅ Bot is now actively running and listening for messages")
-                return {
-                    "status": "success",
-                    "message": f"✅ Bot started successfully as @{me.username if me.username else me.first_name} (ID: {me.id})"
-                }
-            except:
-                pass
-            
-            if not self.client.is_connected:
+            if state == AUTH_AUTHORIZED:
                 try:
-                    await self.client.connect()
-                except ConnectionError:
-                    pass
+                    await self._step("start", self.client.start())
+                    me = self.client.me or await self._step("get_me", self.client.get_me())
+                    return await self._go_live(me)
+                except Unauthorized as e:
+                    # The saved key was revoked server-side; start() has already disconnected
+                    logging.warning(f"Saved session for {self.phone_number} was rejected: {type(e).__name__}")
+                    state = AUTH_FRESH
 
-            try:
-                me = await self.client.get_me()
-                self.is_running = True
-                self.update_user_info(me)
-                
-                # Load feature modules
-                self.load_modules()
-                
-                logging.info(f"✅ Bot is now actively running and listening for messages")
-                return {
-                    "status": "success",
-                    "message": f"✅ Bot started successfully as @{me.username if me.username else me.first_name} (ID: {me.id})"
-                }
-            except:
-                pass
-            
-            if not self.phone_code_hash and not verification_code:
-                logging.info(f"Sending verification code to {self.phone_number}")
-                sent_code = await self.client.send_code(self.phone_number)
-                self.phone_code_hash = sent_code.phone_code_hash
-                self.awaiting_code = True
-                return {
-                    "status": "code_sent",
-                    "message": f"📱 Verification code sent to {self.phone_number}. Please enter the code."
-                }
-            
-            if verification_code and self.phone_code_hash:
+            if state == AUTH_FRESH:
+                if resume:
+                    # Never prompt for a login code while resuming unattended
+                    return {"status": "error", "message": f"❌ Saved session for {self.phone_number} is no longer authorized."}
+                return await self._send_code()
+
+            if state == AUTH_AWAITING_CODE:
+                if not verification_code:
+                    return {
+                        "status": "code_sent",
+                        "message": f"📱 Verification code already sent to {self.phone_number}. Please enter the code."
+                    }
                 logging.info(f"Attempting sign in for {self.phone_number}")
                 try:
-                    await self.client.sign_in(
+                    me = await self._step("sign_in", self.client.sign_in(
                         self.phone_number,
                         self.phone_code_hash,
                         verification_code
-                    )
-                    self.awaiting_code = False
-                    self.is_running = True
-                    me = await self.client.get_me()
-                    self.update_user_info(me)
-                    
-                    self.load_modules()
-                    
-                    return {
-                        "status": "success",
-                        "message": f"✅ Bot started successfully as @{me.username if me.username else me.first_name} (ID: {me.id})"
-                    }
+                    ))
                 except SessionPasswordNeeded:
+                    self.awaiting_code = False
                     self.awaiting_password = True
                     return {
                         "status": "password_required",
@@ -323,21 +1027,23 @@ class TelegramBotManager:
                         "status": "error",
                         "message": f"❌ {type(e).__name__}: Invalid or expired code. Please try again."
                     }
-            
-            if password and self.awaiting_password:
+                self.phone_code_hash = None
+                self.awaiting_code = False
+                await self._step("initialize", self.client.initialize())
+                return await self._go_live(me)
+
+            if state == AUTH_AWAITING_PASSWORD:
+                if not password:
+                    return {
+                        "status": "password_required",
+                        "message": "🔐 2FA is enabled. Please enter your password."
+                    }
                 logging.info(f"Checking 2FA password for {self.phone_number}")
-                await self.client.check_password(password)
+                me = await self._step("check_password", self.client.check_password(password))
                 self.awaiting_password = False
-                self.is_running = True
-                me = await self.client.get_me()
-                self.update_user_info(me)
-                
-                self.load_modules()
-                
-                return {
-                    "status": "success",
-                    "message": f"✅ Bot started successfully as @{me.username if me.username else me.first_name} (ID: {me.id})"
-                }
+                self.phone_code_hash = None
+                await self._step("initialize", self.client.initialize())
+                return await self._go_live(me)
 
             return {"status": "error", "message": "❌ Unexpected state in auth flow"}
                 
@@ -346,8 +1052,11 @@ class TelegramBotManager:
             error_detail = traceback.format_exc()
             logging.error(f"Bot start error: {error_detail}")
             return {"status": "error", "message": f"❌ Login or start failed: {type(e).__name__}: {str(e)}"}
+        finally:
+            steps = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.auth_timings.items())
+            logging.info(f"⏱️ Login step for {self.phone_number} took {time.monotonic() - started:.3f}s ({steps or 'no network calls'})")
 
-    async def stop_bot(self):
+    async def stop_bot(self, forget=True):
         """Stops the Pyrogram client and unloads modules."""
         if self.is_running and self.client:
             self.unload_modules()
@@ -355,35 +1064,407 @@ class TelegramBotManager:
             await self.client.stop()
             self.is_running = False
             self.client = None  
+            if forget:
+                # A deliberate stop; crashes and restarts keep the saved auto-reply state to resume from
+                self.forget_credentials()
+                get_reply_state_store().view(self.session_name).drop_all()
+            self.set_state("stopped")
             return {"status": "success", "message": "🛑 Bot stopped."}
         return {"status": "error", "message": "Bot is not running."}
 
+    async def reset_login(self):
+        """Abandon a login in progress, closing the client (and with it the session file)."""
+        if self.client is not None and self.client.is_connected:
+            await self.client.disconnect()
+        self.client = None
+        self.phone_code_hash = None
+        self.awaiting_code = False
+        self.awaiting_password = False
+        self.set_state("stopped")
 
-def run_async_task(manager, task_name, verification_code=None, password=None):
-    """Utility to run an async method using the persistent event loop."""
-    logging.info(f"Starting async task: {task_name} for phone {manager.phone_number}")
-    
-    if task_name == 'start':
-        coro = manager.start_bot(verification_code=verification_code, password=password)
-    elif task_name == 'stop':
-        coro = manager.stop_bot()
-    else:
-        msg = {"status": "error", "message": "Invalid task"}
-        logging.error(f"Invalid task: {task_name}")
-        socketio.emit('bot_management_result', msg)
+    async def reload_session(self):
+        """
+        Swap in an uploaded session file. A running bot is stopped and
+        resumed around the swap; a login in progress is abandoned, since
+        its client also has the file open.
+        """
+        path = os.path.join(SESSION_DIR, self.session_name + '.session')
+        was_running = self.is_running
+        if was_running:
+            await self.stop_bot(forget=False)
+        elif self.client is not None:
+            await self.reset_login()
+        try:
+            replaced = commit_staged(path)
+        except OSError as e:
+            logging.error(f"Failed to replace {path}: {e}")
+            discard_staged(path)
+            replaced = False
+        if was_running:
+            return await self.start_bot(resume=True)
+        if replaced:
+            return {"status": "success", "message": f"🔁 Session {self.session_name} updated."}
+        return {"status": "success", "message": f"Session {self.session_name} unchanged."}
+
+
+def bot_status_entry(bot_id, bot_manager):
+    """Build the public status record for one bot manager."""
+    display_name = (
+        f"@{bot_manager.user_info['username']}" if bot_manager.user_info.get('username') else
+        bot_manager.user_info.get('first_name') or
+        bot_manager.user_info.get('last_name') or
+        f"ID: {bot_manager.user_info.get('user_id')}" if bot_manager.user_info.get('user_id') else
+        "Unknown User"
+    )
+    return {
+        "bot_id": bot_id,
+        "is_running": bot_manager.is_running,
+        "state": bot_manager.state,
+        "error": bot_manager.last_error,
+        "operation": bot_manager.operation,
+        "auth_timings": dict(bot_manager.auth_timings),
+        "display_name": display_name
+    }
+
+
+def load_saved_bots():
+    """Credentials of every saved session that has a sidecar next to its .session file."""
+    saved = []
+    if not os.path.isdir(SESSION_DIR):
+        return saved
+    for filename in sorted(os.listdir(SESSION_DIR)):
+        if not filename.endswith(BOT_SIDECAR_SUFFIX):
+            continue
+        session_name = filename[:-len(BOT_SIDECAR_SUFFIX)]
+        if not os.path.exists(os.path.join(SESSION_DIR, session_name + '.session')):
+            continue
+        try:
+            with open(os.path.join(SESSION_DIR, filename), encoding='utf-8') as f:
+                record = json.load(f)
+            saved.append({key: record[key] for key in ('api_id', 'api_hash', 'phone_number')})
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Ignoring unreadable bot credentials {filename}: {e}")
+    return saved
+
+
+class SessionCatalog:
+    """Cached scandir index of the session files for the admin endpoints, rebuilt on a directory mtime change or after ttl."""
+    def __init__(self, directory=SESSION_DIR, ttl=SESSION_CATALOG_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.rebuilds = 0
+        self._entries = []
+        self._dir_mtime = None
+        self._built_at = 0.0
+        self._sidecars = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._dir_mtime = None
+
+    def entries(self):
+        """Current index (sorted by name); each entry is a dict with name, bytes, mtime, session and bot_id."""
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                self._entries, self._dir_mtime = [], None
+                return []
+            if dir_mtime != self._dir_mtime or time.monotonic() - self._built_at > self.ttl:
+                self._rebuild()
+                self._dir_mtime = dir_mtime
+                self._built_at = time.monotonic()
+            return self._entries
+
+    def _rebuild(self):
+        files = {}
+        sidecars = {}
+        with os.scandir(self.directory) as listing:
+            for item in listing:
+                if item.name.endswith('.session') or item.name.endswith('.session-journal'):
+                    try:
+                        files[item.name] = item.stat()
+                    except FileNotFoundError:
+                        continue
+                elif item.name.endswith(BOT_SIDECAR_SUFFIX):
+                    session_name = item.name[:-len(BOT_SIDECAR_SUFFIX)]
+                    try:
+                        mtime = item.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+                    cached = self._sidecars.get(session_name)
+                    if cached is not None and cached[0] == mtime:
+                        sidecars[session_name] = cached
+                        continue
+                    try:
+                        with open(item.path, encoding='utf-8') as f:
+                            record = json.load(f)
+                        sidecars[session_name] = (mtime, f"{record['phone_number']}_{record['api_id']}")
+                    except (OSError, ValueError, KeyError):
+                        sidecars[session_name] = (mtime, None)
+        self._sidecars = sidecars
+
+        entries = []
+        for name in sorted(files):
+            session_name = name.split('.session', 1)[0]
+            sidecar = sidecars.get(session_name)
+            entries.append({
+                "name": name,
+                "bytes": files[name].st_size,
+                "mtime": files[name].st_mtime,
+                "session": session_name,
+                "bot_id": sidecar[1] if sidecar else None,
+            })
+        self._entries = entries
+        self.rebuilds += 1
+
+
+session_catalog = SessionCatalog()
+
+
+async def resume_bots(managers, concurrency=RESUME_CONCURRENCY, stagger=RESUME_STAGGER):
+    """
+    Reopen saved sessions concurrently: at most `concurrency` logins are in
+    flight and consecutive connects start at least `stagger` seconds apart,
+    so a large fleet does not hit Telegram's data centers all at once.
+    Returns a timing summary.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pacing = asyncio.Lock()
+    next_connect = 0.0
+    started = loop.time()
+    timings = []
+    failed = []
+
+    async def resume(manager):
+        nonlocal next_connect
+        async with semaphore:
+            async with pacing:
+                delay = next_connect - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_connect = loop.time() + stagger
+            begun = loop.time()
+            future, _ = manager.submit_operation('resume')
+            try:
+                result = await asyncio.wrap_future(future)
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            timings.append(loop.time() - begun)
+            if result["status"] != "success":
+                failed.append(manager.bot_id)
+
+    await asyncio.gather(*(resume(manager) for manager in managers))
+
+    timings.sort()
+    summary = {
+        "total": len(timings),
+        "resumed": len(timings) - len(failed),
+        "failed": failed,
+        "elapsed": loop.time() - started,
+        "avg": sum(timings) / len(timings) if timings else 0.0,
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))] if timings else 0.0,
+        "max": timings[-1] if timings else 0.0,
+    }
+    logging.info(
+        f"⏱️ Resumed {summary['resumed']}/{summary['total']} saved sessions in {summary['elapsed']:.2f}s "
+        f"(per account avg {summary['avg']:.2f}s, p95 {summary['p95']:.2f}s, max {summary['max']:.2f}s, "
+        f"concurrency {concurrency}, stagger {stagger * 1000:.0f}ms)"
+    )
+    for bot_id in failed:
+        logging.warning(f"⚠️ Could not resume {bot_id}")
+    return summary
+
+
+def bot_metric_families(managers):
+    """Per-bot gauges and counters, read from each manager at scrape time (call on the bots' loop)."""
+    families = {}
+
+    def add(name, kind, help, labels, value):
+        if name not in families:
+            families[name] = (name, kind, help, [])
+        families[name][3].append(('', labels, value))
+
+    for manager in managers:
+        bot = {"bot": manager.session_name}
+        add('userbot_bot_running', 'gauge', 'Whether the bot is running', bot, int(manager.is_running))
+        for module in manager.modules:
+            for key, value in module.metrics().items():
+                add(f'userbot_{key}', 'gauge', f'{module.name} {key.replace("_", " ")}', bot, value)
+
+        if manager.conversation is not None:
+            stats = manager.conversation.stats()
+            add('userbot_conversation_requests_total', 'counter', 'AI requests', bot, stats['requests'])
+            add('userbot_conversation_errors_total', 'counter', 'AI requests that failed', bot, stats['errors'])
+            add('userbot_conversation_empty_total', 'counter', 'AI responses without text', bot, stats['empty_responses'])
+            add('userbot_conversation_cache_hits_total', 'counter', 'Answers served from the cache', bot, stats['cache_hits'])
+            history = stats['history']
+            add('userbot_conversation_store_chats', 'gauge', 'Chats resident in the conversation store', bot, history['resident_chats'])
+            add('userbot_conversation_store_bytes', 'gauge', 'Bytes resident in the conversation store', bot, history['resident_bytes'])
+            add('userbot_conversation_store_evictions_total', 'counter', 'Chats evicted from the conversation store', bot, history['evictions'])
+            if 'spilled_chats' in history:
+                add('userbot_conversation_store_spilled_chats', 'gauge', 'Chats spilled to disk', bot, history['spilled_chats'])
+
+        if manager.outbound is not None:
+            stats = manager.outbound.stats()
+            add('userbot_outbound_queue_depth', 'gauge', 'Sends waiting for an account token', bot, stats['queued'])
+            add('userbot_outbound_sent_total', 'counter', 'Outbound sends completed', bot, stats['sent'])
+            add('userbot_outbound_failed_total', 'counter', 'Outbound sends that failed', bot, stats['failed'])
+            add('userbot_outbound_flood_waits_total', 'counter', 'FloodWait errors received', bot, stats['flood_waits'])
+
+        if manager.router is not None:
+            for route, counter in manager.router.stats().items():
+                labels = {**bot, "route": route}
+                add('userbot_route_hits_total', 'counter', 'Private text updates dispatched per route', labels, counter['hits'])
+                add('userbot_route_errors_total', 'counter', 'Route handlers that raised', labels, counter['errors'])
+    return list(families.values())
+
+
+class ShardEmitter:
+    """Stands in for the Socket.IO server inside a shard process and forwards emits to the supervisor."""
+    def __init__(self, events):
+        self.events = events
+
+    def emit(self, event, data=None, room=None, **kwargs):
+        self.events.put(('emit', event, data, room))
+
+
+def _shard_worker(shard_id, commands, events):
+    """Entry point of a shard process: one event loop driving its own set of bot managers."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    emitter = ShardEmitter(events)
+    feed = TerminalFeed(emitter)
+    managers = {}
+
+    def publish_status(bot_id, entry):
+        events.put(('status', bot_id, entry))
+    logging.info(f"Shard {shard_id} started (pid {os.getpid()})")
+
+    def manager_for(bot_id, api_id, api_hash, phone_number):
+        if bot_id not in managers:
+            managers[bot_id] = TelegramBotManager(api_id, api_hash, phone_number,
+                                                  socketio_server=emitter, loop=loop, feed=feed,
+                                                  status_sink=publish_status)
+        return managers[bot_id]
+
+    def handle(command):
+        task_name = command['op']
+        if task_name == 'resume':
+            resumed = [manager_for(f"{bot['phone_number']}_{bot['api_id']}", bot['api_id'], bot['api_hash'],
+                                   bot['phone_number']) for bot in command['bots']]
+            asyncio.run_coroutine_threadsafe(resume_bots(resumed, command['concurrency']), loop)
+            return
+        bot_id = command['bot_id']
+        manager = managers.get(bot_id)
+        if manager is None:
+            if task_name == 'reload':
+                # The upload was staged for a manager this shard no longer has; don't leave the file behind
+                discard_staged(os.path.join(SESSION_DIR, session_name_for(bot_id.rsplit('_', 1)[0]) + '.session'))
+                emitter.emit('bot_management_result', {
+                    "status": "error", "message": f"Bot instance not found - uploaded session for {bot_id} discarded."})
+                return
+            if task_name != 'start':
+                emitter.emit('bot_management_result', {"status": "error", "message": "Bot instance not found."})
+                return
+            manager = manager_for(bot_id, command['api_id'], command['api_hash'], command['phone_number'])
+        manager.submit_operation(task_name, command.get('verification_code'), command.get('password'))
+
+    def read_commands():
+        while True:
+            command = commands.get()
+            if command is None:
+                loop.call_soon_threadsafe(loop.stop)
+                return
+            handle(command)
+
+    async def push_metrics():
+        while True:
+            await asyncio.sleep(METRICS_PUSH_INTERVAL)
+            events.put(('metrics', shard_id, REGISTRY.collect() + bot_metric_families(managers.values())))
+
+    threading.Thread(target=read_commands, daemon=True).start()
+    loop_lag.start(loop)
+    loop.create_task(push_metrics())
+    loop.run_forever()
+
+
+class ShardSupervisor:
+    """Spreads bot managers over a pool of worker processes, each with its own event loop."""
+    def __init__(self, workers):
+        ctx = multiprocessing.get_context('spawn')
+        self.events = ctx.Queue()
+        self.shards = []
+        self.metrics = {}
+        for shard_id in range(workers):
+            commands = ctx.Queue()
+            process = ctx.Process(target=_shard_worker, args=(shard_id, commands, self.events),
+                                  name=f"bot-shard-{shard_id}", daemon=True)
+            process.start()
+            self.shards.append((process, commands))
+        threading.Thread(target=self._forward_events, daemon=True).start()
+        logging.info(f"✅ Started {workers} bot shard process(es)")
+
+    def shard_for(self, bot_id):
+        return zlib.crc32(bot_id.encode()) % len(self.shards)
+
+    def submit(self, bot_id, task_name, **kwargs):
+        """Queue a lifecycle command on the shard that owns bot_id."""
+        _, commands = self.shards[self.shard_for(bot_id)]
+        commands.put({"op": task_name, "bot_id": bot_id, **kwargs})
+
+    def resume(self, bots, concurrency=RESUME_CONCURRENCY):
+        """Hand each shard its share of saved sessions; the concurrency limit is split between shards."""
+        by_shard = {}
+        for bot in bots:
+            by_shard.setdefault(self.shard_for(f"{bot['phone_number']}_{bot['api_id']}"), []).append(bot)
+        per_shard = max(1, concurrency // len(self.shards))
+        for shard_id, shard_bots in by_shard.items():
+            _, commands = self.shards[shard_id]
+            commands.put({"op": "resume", "bots": shard_bots, "concurrency": per_shard})
+
+    def _forward_events(self):
+        while True:
+            kind, *payload = self.events.get()
+            if kind == 'emit':
+                event, data, room = payload
+                socketio.emit(event, data, room=room)
+            elif kind == 'status':
+                bot_id, entry = payload
+                status_board.update(bot_id, entry)
+            elif kind == 'metrics':
+                shard_id, families = payload
+                self.metrics[shard_id] = families
+
+    def shutdown(self):
+        for process, commands in self.shards:
+            commands.put(None)
+        for process, commands in self.shards:
+            process.join(timeout=5)
+
+
+shard_supervisor = None
+
+def resume_saved_bots():
+    """Start every saved session in the background (AUTO_RESUME)."""
+    saved = load_saved_bots()
+    if not saved:
+        logging.info("No saved sessions to resume")
         return
+    logging.info(f"🔄 Resuming {len(saved)} saved session(s)")
+    if shard_supervisor:
+        shard_supervisor.resume(saved)
+        return
+    managers = []
+    for bot in saved:
+        bot_id = f"{bot['phone_number']}_{bot['api_id']}"
+        if bot_id not in active_bots:
+            active_bots[bot_id] = TelegramBotManager(bot['api_id'], bot['api_hash'], bot['phone_number'])
+        managers.append(active_bots[bot_id])
+    asyncio.run_coroutine_threadsafe(resume_bots(managers), get_async_loop())
 
-    try:
-        logging.info(f"Executing {task_name} task...")
-        future = asyncio.run_coroutine_threadsafe(coro, manager.loop)
-        result = future.result(timeout=60)
-        logging.info(f"Task {task_name} completed with result: {result}")
-        socketio.emit('bot_management_result', result)
-        
-    except Exception as e:
-        error_msg = f"Thread exception: {type(e).__name__}: {str(e)}"
-        logging.error(f"Error in {task_name} task: {error_msg}", exc_info=True)
-        socketio.emit('bot_management_result', {"status": "error", "message": error_msg})
 
 @app.route('/api/bot/start', methods=['POST'])
 def start_bot_route():
@@ -398,11 +1479,18 @@ def start_bot_route():
         return jsonify({"status": "error", "message": "Missing API ID, Hash, or Phone Number."}), 400
     
     bot_id = f"{phone_number}_{api_id}"
+    if shard_supervisor:
+        shard_supervisor.submit(bot_id, 'start', api_id=api_id, api_hash=api_hash, phone_number=phone_number,
+                                verification_code=verification_code, password=password)
+        return jsonify({"status": "starting", "message": f"Bot startup initiated for {phone_number}. Check terminal for status."})
+
     if bot_id not in active_bots:
         active_bots[bot_id] = TelegramBotManager(api_id, api_hash, phone_number)
     
     manager = active_bots[bot_id]
-    threading.Thread(target=run_async_task, args=(manager, 'start', verification_code, password), daemon=True).start()
+    _, coalesced = manager.submit_operation('start', verification_code, password)
+    if coalesced:
+        return jsonify({"status": "starting", "message": f"Bot startup for {phone_number} is already in progress."})
     
     return jsonify({"status": "starting", "message": f"Bot startup initiated for {phone_number}. Check terminal for status."})
 
@@ -414,35 +1502,62 @@ def stop_bot_route():
     api_id = data.get('api_id')
     bot_id = f"{phone_number}_{api_id}"
     
+    if shard_supervisor:
+        if bot_id not in status_board:
+            return jsonify({"status": "error", "message": "Bot instance not found."})
+        shard_supervisor.submit(bot_id, 'stop')
+        return jsonify({"status": "stopping", "message": f"Bot shutdown initiated for {phone_number}. Check terminal for status."})
+
     if bot_id not in active_bots:
         return jsonify({"status": "error", "message": "Bot instance not found."})
 
     manager = active_bots[bot_id]
     
-    threading.Thread(target=run_async_task, args=(manager, 'stop'), daemon=True).start()
+    _, coalesced = manager.submit_operation('stop')
+    if coalesced:
+        return jsonify({"status": "stopping", "message": f"Bot shutdown for {phone_number} is already in progress."})
     
     return jsonify({"status": "stopping", "message": f"Bot shutdown initiated for {phone_number}. Check terminal for status."})
 
 
 @app.route('/api/bot/status', methods=['GET'])
 def bot_status():
-    status_list = []
-    for bot_id, bot_manager in active_bots.items():
-        display_name = (
-            f"@{bot_manager.user_info['username']}" if bot_manager.user_info.get('username') else
-            bot_manager.user_info.get('first_name') or
-            bot_manager.user_info.get('last_name') or
-            f"ID: {bot_manager.user_info.get('user_id')}" if bot_manager.user_info.get('user_id') else
-            "Unknown User"
-        )
-        
-        status_list.append({
-            "bot_id": bot_id,
-            "is_running": bot_manager.is_running,
-            "display_name": display_name
-        })
-    
-    return jsonify({"bots": status_list})
+    """Cheap snapshot of the status board; honours If-None-Match with a 304."""
+    version, status_list = status_board.snapshot()
+    response = jsonify({"bots": status_list, "version": version})
+    response.set_etag(f"bots-{status_board.boot_id}-{version}")
+    return response.make_conditional(request)
+
+
+@app.route('/api/bot/operation', methods=['GET'])
+def bot_operation():
+    """Report the latest lifecycle operation (name, queued/running/done/failed) for one bot."""
+    bot_id = request.args.get('bot_id')
+    _, status_list = status_board.snapshot()
+    for entry in status_list:
+        if entry["bot_id"] == bot_id:
+            return jsonify({"bot_id": bot_id, "operation": entry.get("operation")})
+    return jsonify({"status": "error", "message": "Bot instance not found."}), 404
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of handler, Gemini, loop and per-bot metrics."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+
+    async def collect():
+        return REGISTRY.collect() + bot_metric_families(list(active_bots.values()))
+
+    try:
+        # Read everything on the bots' own loop so nothing changes mid-scrape
+        families = asyncio.run_coroutine_threadsafe(collect(), get_async_loop()).result(timeout=5)
+    except concurrent.futures.TimeoutError:
+        return Response("Event loop did not respond\n", status=503, mimetype='text/plain')
+    if shard_supervisor:
+        for shard_id, shard_families in list(shard_supervisor.metrics.items()):
+            families += with_labels(shard_families, shard=str(shard_id))
+    return Response(render(families), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/admin')
@@ -473,28 +1588,70 @@ def admin_logout():
     return jsonify({"status": "success", "message": "Logged out"})
 
 
+def session_owners():
+    """
+    Map session name -> (bot_id, is_running, is_open) for every bot
+    manager this server knows about. is_open means a client may have the
+    session file open (running, or a login in progress).
+    """
+    if shard_supervisor:
+        # Shard managers are only visible through their published state; anything but 'stopped' may hold the file
+        _, entries = status_board.snapshot()
+        return {session_name_for(entry['bot_id'].rsplit('_', 1)[0]):
+                (entry['bot_id'], entry['is_running'], entry['is_running'] or entry['state'] != 'stopped')
+                for entry in entries}
+    return {manager.session_name: (bot_id, manager.is_running,
+                                   manager.is_running or (manager.client is not None and manager.client.is_connected))
+            for bot_id, manager in list(active_bots.items())}
+
+
+def filter_sessions(entries, owners, query=None, running=None):
+    """Catalog entries joined with live bot state, optionally filtered by name/bot_id substring and running state."""
+    matched = []
+    query = (query or '').lower()
+    for entry in entries:
+        bot_id, is_running, _ = owners.get(entry["session"], (entry["bot_id"], False, False))
+        if query and query not in entry["name"].lower() and query not in (bot_id or '').lower():
+            continue
+        if running is not None and is_running != running:
+            continue
+        matched.append({**entry, "bot_id": bot_id, "is_running": is_running})
+    return matched
+
+
+def running_filter(value):
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+
 @app.route('/api/admin/sessions/list', methods=['GET'])
 @admin_required
 def list_sessions():
-    """List all session files in the session directory."""
+    """List session files from the cached catalog (?q=, ?running=, ?page=, ?per_page=)."""
     try:
         session_dir = 'session'
         if not os.path.exists(session_dir):
             os.makedirs(session_dir)
-            return jsonify({"sessions": []})
-        
+            return jsonify({"sessions": [], "total": 0, "page": 1, "per_page": 0})
+
+        page = max(1, request.args.get('page', type=int, default=1))
+        per_page = min(max(1, request.args.get('per_page', type=int, default=100)), 1000)
+        matched = filter_sessions(session_catalog.entries(), session_owners(),
+                                  request.args.get('q'), running_filter(request.args.get('running')))
+
         sessions = []
-        for filename in os.listdir(session_dir):
-            if filename.endswith('.session') or filename.endswith('.session-journal'):
-                filepath = os.path.join(session_dir, filename)
-                file_size = os.path.getsize(filepath)
-                size_kb = file_size / 1024
-                sessions.append({
-                    "name": filename,
-                    "size": f"{size_kb:.2f} KB"
-                })
-        
-        return jsonify({"sessions": sessions})
+        for entry in matched[(page - 1) * per_page:page * per_page]:
+            sessions.append({
+                "name": entry["name"],
+                "size": f"{entry['bytes'] / 1024:.2f} KB",
+                "bytes": entry["bytes"],
+                "mtime": entry["mtime"],
+                "bot_id": entry["bot_id"],
+                "is_running": entry["is_running"],
+            })
+
+        return jsonify({"sessions": sessions, "total": len(matched), "page": page, "per_page": per_page})
     except Exception as e:
         logging.error(f"Error listing sessions: {e}")
         return jsonify({"error": str(e)}), 500
@@ -503,27 +1660,31 @@ def list_sessions():
 @app.route('/api/admin/sessions/download', methods=['GET'])
 @admin_required
 def download_sessions():
-    """Download all session files as a ZIP archive."""
+    """Stream session files as a ZIP archive (?compression=store|deflate, ?level=1-9, list filters ?q=, ?running=)."""
     try:
         session_dir = 'session'
         if not os.path.exists(session_dir):
             return jsonify({"error": "Session directory not found"}), 404
-        
-        memory_file = io.BytesIO()
-        
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filename in os.listdir(session_dir):
-                if filename.endswith('.session') or filename.endswith('.session-journal'):
-                    filepath = os.path.join(session_dir, filename)
-                    zipf.write(filepath, filename)
-        
-        memory_file.seek(0)
-        
-        return send_file(
-            memory_file,
+
+        mode = request.args.get('compression', 'deflate').lower()
+        if mode not in ('store', 'deflate'):
+            return jsonify({"error": "compression must be 'store' or 'deflate'"}), 400
+        level = request.args.get('level', type=int, default=SESSION_EXPORT_LEVEL)
+        if mode == 'store' or level == 0:
+            compression, level = zipfile.ZIP_STORED, None
+        else:
+            compression, level = zipfile.ZIP_DEFLATED, min(max(level, 1), 9)
+
+        # Journals are left out: each .session is exported from a consistent SQLite snapshot
+        matched = filter_sessions(session_catalog.entries(), session_owners(),
+                                  request.args.get('q'), running_filter(request.args.get('running')))
+        entries = [(entry["name"], os.path.join(session_dir, entry["name"]))
+                   for entry in matched if entry["name"].endswith('.session')]
+
+        return Response(
+            stream_with_context(stream_zip(entries, compression, level)),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name='sessions_backup.zip'
+            headers={'Content-Disposition': 'attachment; filename=sessions_backup.zip'},
         )
     except Exception as e:
         logging.error(f"Error downloading sessions: {e}")
@@ -533,7 +1694,15 @@ def download_sessions():
 @app.route('/api/admin/sessions/upload', methods=['POST'])
 @admin_required
 def upload_sessions():
-    """Upload and replace all session files from a ZIP archive."""
+    """
+    Sync session files from a ZIP archive (?mode=sync|replace).
+
+    Only entries whose content changed are written (atomically), and only
+    bots whose session changed are restarted; a login in progress on a
+    changed session is reset. ``replace`` also deletes local sessions that
+    are not in the archive, unless a client has them open (running bot or
+    login in progress) - those are reported as skipped.
+    """
     try:
         if 'sessions' not in request.files:
             return jsonify({"error": "No file uploaded"}), 400
@@ -545,42 +1714,73 @@ def upload_sessions():
         
         if not file.filename.endswith('.zip'):
             return jsonify({"error": "Only ZIP files are allowed"}), 400
+
+        mode = request.form.get('mode') or request.args.get('mode', 'sync')
+        if mode not in ('sync', 'replace'):
+            return jsonify({"error": "mode must be 'sync' or 'replace'"}), 400
         
         session_dir = 'session'
-        
-        if os.path.exists(session_dir):
-            for filename in os.listdir(session_dir):
-                if filename.endswith('.session') or filename.endswith('.session-journal'):
-                    os.remove(os.path.join(session_dir, filename))
-        else:
-            os.makedirs(session_dir)
-        
+        os.makedirs(session_dir, exist_ok=True)
+
         with zipfile.ZipFile(file, 'r') as zip_ref:
-            for member in zip_ref.namelist():
-                if member.endswith('.session') or member.endswith('.session-journal'):
-                    member_path = os.path.normpath(member)
-                    if member_path.startswith('..') or os.path.isabs(member_path):
-                        logging.warning(f"Skipping suspicious path: {member}")
-                        continue
-                    
-                    target_path = os.path.join(session_dir, os.path.basename(member_path))
-                    target_path = os.path.realpath(target_path)
-                    session_dir_real = os.path.realpath(session_dir)
-                    
-                    if not target_path.startswith(session_dir_real + os.sep):
-                        logging.warning(f"Path traversal attempt detected: {member}")
-                        continue
-                    
-                    with zip_ref.open(member) as source, open(target_path, 'wb') as target:
-                        shutil.copyfileobj(source, target)
-        
-        return jsonify({"message": "Sessions uploaded and replaced successfully"}), 200
+            diff = stage_sessions(zip_ref, session_dir)
+
+        # Bots that own a session: their file is swapped inside a 'reload' operation, serialised with start/stop
+        owners = session_owners()
+
+        diff["reloaded"] = []
+        diff["reset"] = []
+        diff["removed"] = []
+        for filename in diff["added"] + diff["updated"]:
+            path = os.path.join(session_dir, filename)
+            owner = owners.get(filename[:-len('.session')])
+            if owner is None:
+                commit_staged(path)
+                continue
+            bot_id, is_running, is_open = owner
+            if shard_supervisor:
+                shard_supervisor.submit(bot_id, 'reload')
+            else:
+                active_bots[bot_id].submit_operation('reload')
+            if is_running:
+                diff["reloaded"].append(bot_id)
+            elif is_open:
+                diff["reset"].append(bot_id)
+
+        if mode == 'replace':
+            uploaded = set(diff["added"] + diff["updated"] + diff["unchanged"])
+            for entry in session_catalog.entries():
+                filename = entry["name"]
+                if not filename.endswith('.session') or filename in uploaded:
+                    continue
+                owner = owners.get(filename[:-len('.session')])
+                if owner is not None and owner[2]:
+                    diff["skipped"].append(filename)
+                    continue
+                os.remove(os.path.join(session_dir, filename))
+                journal = os.path.join(session_dir, filename + '-journal')
+                if os.path.exists(journal):
+                    os.remove(journal)
+                diff["removed"].append(filename)
+
+        session_catalog.invalidate()
+        logging.info(f"Session upload ({mode}): {len(diff['added'])} added, {len(diff['updated'])} updated, "
+                     f"{len(diff['unchanged'])} unchanged, {len(diff['removed'])} removed, "
+                     f"{len(diff['reloaded'])} bot(s) reloading, {len(diff['reset'])} login(s) reset")
+        return jsonify({"message": "Sessions synced", "mode": mode, **diff}), 200
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Not a valid ZIP archive"}), 400
     except Exception as e:
         logging.error(f"Error uploading sessions: {e}")
         return jsonify({"error": str(e)}), 500
 
 
 if __name__ == '__main__':
+    if SHARD_WORKERS > 0:
+        shard_supervisor = ShardSupervisor(SHARD_WORKERS)
+    if AUTO_RESUME:
+        resume_saved_bots()
+
     logging.info(f"Flask-SocketIO server starting on http://0.0.0.0:{port}")
     try:
         socketio.run(
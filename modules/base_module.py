@@ -1,12 +1,24 @@
 from abc import ABC, abstractmethod
 from pyrogram import Client
 from flask_socketio import SocketIO
+from .outbound import PRIORITY_INTERACTIVE
+from .command_router import CommandRouter
+from .sent_messages import SentMessages
+from .metrics import HANDLER_SECONDS, timed
 
 
 class BaseModule(ABC):
-    def __init__(self, client: Client, socketio: SocketIO):
+    def __init__(self, client: Client, socketio: SocketIO, conversation=None, outbound=None, router=None, sent=None):
         self.client = client
         self.socketio = socketio
+        # Shared per-bot ConversationService (None when a module is used standalone)
+        self.conversation = conversation
+        # Shared per-bot OutboundDispatcher (None = send directly)
+        self.outbound = outbound
+        # Shared per-bot CommandRouter for incoming private text (created on demand when standalone)
+        self.router = router
+        # Shared per-bot record of the bot's own sends (a private one when standalone)
+        self.sent = sent if sent is not None else SentMessages()
         self.name = self.__class__.__name__
     
     @abstractmethod
@@ -16,5 +28,41 @@ class BaseModule(ABC):
     def cleanup(self):
         pass
     
+    def on_command(self, name: str, handler):
+        # handler(message, args) runs for "/name args" in incoming private chats
+        self._router().command(name, self.instrument(handler))
+    
+    def on_text(self, handler):
+        # handler(message, text) is the single consumer of non-command private text
+        self._router().set_text_consumer(self.instrument(handler))
+    
+    def on_unknown_command(self, handler):
+        self._router().set_fallback(self.instrument(handler))
+    
+    def instrument(self, handler):
+        # Record the handler's latency in userbot_handler_seconds; put it under @client.on_message(...)
+        return timed(HANDLER_SECONDS, (self.client.name, self.name, handler.__name__))(handler)
+    
+    def metrics(self) -> dict:
+        # Gauges exported per bot at /metrics, e.g. {"pending_timers": 3}
+        return {}
+    
+    def _router(self) -> CommandRouter:
+        if self.router is None:
+            self.router = CommandRouter(self.client)
+        return self.router
+    
+    async def dispatch(self, chat_id: int, call, priority: int = PRIORITY_INTERACTIVE, text: str = None):
+        # Rate-limited, FloodWait-aware send; call is a zero-argument coroutine function.
+        # Pass the text of a new message so its outgoing update is not taken for a manual reply
+        if self.outbound is None:
+            send = call
+        else:
+            send = lambda: self.outbound.send(chat_id, call, priority)
+        if text is None:
+            return await send()
+        return await self.sent.track(chat_id, text, send)
+    
     def emit_terminal(self, message: str):
+        # self.socketio is the bot's BotTerminal, which batches lines into the bot's room
         self.socketio.emit('output', {'data': f'{message}\n'})
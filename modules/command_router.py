@@ -0,0 +1,76 @@
+import re
+import time
+import logging
+from pyrogram import filters
+from pyrogram.types import Message
+
+
+_COMMAND = re.compile(r'^/(\w+)(?:@\w+)?')
+
+
+class CommandRouter:
+    """
+    Single entry point for incoming private text messages.
+
+    Each update is parsed once: ``/name args`` is looked up in a command
+    table and handed to ``handler(message, args)``; unknown commands go to
+    the fallback; everything else goes to the one registered text
+    consumer. Hits, errors and time spent are counted per route.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = {}
+        self.text_consumer = None
+        self.fallback = None
+        self.counters = {}
+
+        @client.on_message(filters.private & filters.incoming & filters.text)
+        async def route(client, message: Message):
+            await self.dispatch(message)
+
+    def command(self, name: str, handler):
+        name = name.lower()
+        if name in self.commands:
+            logging.warning(f"⚠️ Command /{name} registered twice - keeping the latest handler")
+        self.commands[name] = handler
+
+    def set_text_consumer(self, handler):
+        if self.text_consumer is not None:
+            logging.warning("⚠️ Replacing the existing text consumer")
+        self.text_consumer = handler
+
+    def set_fallback(self, handler):
+        self.fallback = handler
+
+    async def dispatch(self, message: Message):
+        text = message.text
+        if text.startswith('/'):
+            match = _COMMAND.match(text)
+            handler = self.commands.get(match.group(1).lower()) if match else None
+            if handler is not None:
+                route = f"/{match.group(1).lower()}"
+            else:
+                route, handler = "unknown_command", self.fallback
+            args = text[match.end():].strip() if match else text[1:].strip()
+        else:
+            route, handler, args = "text", self.text_consumer, text
+
+        counter = self.counters.get(route)
+        if counter is None:
+            counter = self.counters[route] = {"hits": 0, "errors": 0, "seconds": 0.0}
+        counter["hits"] += 1
+        if handler is None:
+            return
+
+        started = time.monotonic()
+        try:
+            await handler(message, args)
+        except Exception as e:
+            counter["errors"] += 1
+            logging.error(f"Error handling {route}: {e}", exc_info=True)
+        finally:
+            counter["seconds"] += time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {route: dict(counter) for route, counter in self.counters.items()}
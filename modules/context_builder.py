@@ -0,0 +1,143 @@
+import os
+import json
+from collections import OrderedDict
+
+
+SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap upper-bound token estimate (~4 UTF-8 bytes per token)."""
+    return len(text.encode('utf-8')) // 4 + 4
+
+
+def _encode(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class _ChatContext:
+    def __init__(self):
+        self.fragments = {}
+        self.summarized = set()
+        self.summary_lines = []
+        self.summary_tokens = 0
+        self.preamble_key = None
+        self.preamble_fragment = None
+        self.base_key = None
+        self.base_tokens = 0
+
+
+class ContextBuilder:
+    """
+    Builds generateContent request bodies that fit a token budget.
+
+    Each history turn is JSON-encoded once and its fragment cached, so a
+    request body is assembled by joining strings. The newest turns are
+    sent verbatim; older ones that no longer fit are folded into a
+    rolling summary attached to the system prompt turn.
+    """
+
+    def __init__(self, max_tokens: int = 8000, summary_tokens: int = 500, max_cached_chats: int = 1024):
+        self.max_tokens = max_tokens
+        self.summary_budget = summary_tokens
+        self.max_cached_chats = max_cached_chats
+        self._chats = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_tokens=int(os.getenv('GEMINI_CONTEXT_TOKENS', '8000')),
+            summary_tokens=int(os.getenv('GEMINI_SUMMARY_TOKENS', '500')),
+        )
+
+    def forget(self, chat_id):
+        self._chats.pop(chat_id, None)
+
+    def clear(self):
+        self._chats.clear()
+
+    def build(self, chat_id, preamble, history, generation_config: dict = None) -> bytes:
+        """Return the encoded request body for chat_id's preamble plus history."""
+        ctx = self._context(chat_id)
+        turns = list(history or ())
+
+        fragments = {}
+        encoded = []
+        for turn in turns:
+            entry = ctx.fragments.get(id(turn))
+            if entry is None or entry[0] is not turn:
+                text = _encode(turn)
+                entry = (turn, text, estimate_tokens(text))
+            fragments[id(turn)] = entry
+            encoded.append(entry)
+        ctx.fragments = fragments
+
+        budget = self.max_tokens - self.summary_budget - self._preamble_tokens(ctx, preamble)
+        kept_from = len(encoded)
+        used = 0
+        for index in range(len(encoded) - 1, -1, -1):
+            tokens = encoded[index][2]
+            if used + tokens > budget and kept_from < len(encoded):
+                break
+            used += tokens
+            kept_from = index
+
+        self._summarize(ctx, turns[:kept_from])
+        ctx.summarized &= fragments.keys()
+
+        parts = [self._preamble_fragment(ctx, preamble)]
+        parts.extend(entry[1] for entry in encoded[kept_from:])
+        body = '{"contents":[' + ','.join(parts) + ']'
+        if generation_config:
+            body += ',"generationConfig":' + _encode(generation_config)
+        return (body + '}').encode('utf-8')
+
+    def _context(self, chat_id) -> _ChatContext:
+        ctx = self._chats.get(chat_id)
+        if ctx is None:
+            ctx = self._chats[chat_id] = _ChatContext()
+            while len(self._chats) > self.max_cached_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return ctx
+
+    def _summarize(self, ctx: _ChatContext, dropped):
+        for turn in dropped:
+            if id(turn) in ctx.summarized:
+                continue
+            ctx.summarized.add(id(turn))
+            text = ' '.join(part.get('text', '') for part in turn.get('parts', [])).strip().replace('\n', ' ')
+            if not text:
+                continue
+            speaker = "User" if turn.get('role') == 'user' else "Assistant"
+            if len(text) > SUMMARY_LINE_CHARS:
+                text = text[:SUMMARY_LINE_CHARS] + '…'
+            line = f"- {speaker}: {text}"
+            if line in ctx.summary_lines:
+                continue
+            ctx.summary_lines.append(line)
+            ctx.summary_tokens += estimate_tokens(line)
+
+        while ctx.summary_lines and ctx.summary_tokens > self.summary_budget:
+            ctx.summary_tokens -= estimate_tokens(ctx.summary_lines.pop(0))
+
+    def _preamble_tokens(self, ctx: _ChatContext, preamble) -> int:
+        """Token cost of the preamble without the summary, which has its own budget."""
+        key = tuple(id(turn) for turn in preamble)
+        if ctx.base_key != key:
+            ctx.base_tokens = sum(estimate_tokens(_encode(turn)) for turn in preamble)
+            ctx.base_key = key
+        return ctx.base_tokens
+
+    def _preamble_fragment(self, ctx: _ChatContext, preamble) -> str:
+        key = (tuple(id(turn) for turn in preamble), len(ctx.summary_lines),
+               ctx.summary_lines[-1] if ctx.summary_lines else None)
+        if ctx.preamble_key != key:
+            turns = [dict(turn) for turn in preamble]
+            if ctx.summary_lines and turns:
+                summary = "Summary of the earlier conversation:\n" + '\n'.join(ctx.summary_lines)
+                turns[0]['parts'] = list(turns[0].get('parts', [])) + [{"text": summary}]
+            ctx.preamble_fragment = ','.join(_encode(turn) for turn in turns)
+            ctx.preamble_key = key
+        return ctx.preamble_fragment
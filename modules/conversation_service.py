@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+from pyrogram.types import Message
+from .gemini_client import get_gemini_client
+from .conversation_store import ConversationStore
+from .context_builder import ContextBuilder
+from .streaming import stream_reply, streaming_enabled
+from .response_cache import get_response_cache, fingerprint
+from .metrics import GEMINI_SECONDS, GEMINI_ERRORS
+
+
+MAX_HISTORY_LENGTH = 50
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 2048,
+}
+
+
+def owner_name_from_env() -> str:
+    """Name the assistant speaks for (OWNER_NAME); the prompt leaves it out when unset."""
+    return os.getenv('OWNER_NAME', '').strip() or None
+
+
+def build_preamble(owner_name: str = None) -> list:
+    """System prompt and model acknowledgement sent ahead of every chat's history."""
+    assistant = f"You are a helpful AI assistant of {owner_name}." if owner_name else "You are a helpful AI assistant."
+    system_prompt = {
+        "role": "user",
+        "parts": [{
+            "text": f"{assistant} Language guidelines:\n"
+                    "- If the user writes in Bengali (বাংলা) or uses English letters to write Bengali (Banglish/Roman Bengali), respond in Bengali (বাংলা script)\n"
+                    "- If the user writes in English, respond in English\n"
+                    "- If the user writes in any other language, respond in English\n"
+                    "- Be natural, friendly, and helpful in your responses"
+        }]
+    }
+    model_ack = {
+        "role": "model",
+        "parts": [{"text": "আমি বুঝেছি! আমি বাংলা বা ইংরেজিতে সাহায্য করতে পারি। কিভাবে সাহায্য করতে পারি?"}]
+    }
+    return [system_prompt, model_ack]
+
+
+class ConversationService:
+    """
+    Per-bot conversation engine shared by every module.
+
+    Holds the single history per chat, builds request bodies, talks to
+    Gemini (plain or streaming) and keeps one set of counters. Owned by
+    TelegramBotManager and handed to modules through BaseModule.
+    """
+
+    def __init__(self, namespace: str, owner_name: str = None):
+        self.gemini = get_gemini_client()
+        self.enabled = self.gemini.enabled
+        self.history = ConversationStore.from_env(namespace, MAX_HISTORY_LENGTH)
+        self.context_builder = ContextBuilder.from_env()
+        self.streaming = streaming_enabled()
+        self.preamble = build_preamble(owner_name or owner_name_from_env())
+
+        # First-turn answers depend only on the model and preamble, so they can be shared
+        self.answer_cache = get_response_cache()
+        self.cache_context = fingerprint(self.gemini.model, self.preamble)
+
+        self.requests = 0
+        self.errors = 0
+        self.empty_responses = 0
+        self.cache_hits = 0
+        self.total_latency = 0.0
+        self._generate_labels = (namespace, "generate")
+        self._stream_labels = (namespace, "stream")
+
+        if not self.enabled:
+            logging.error("❌ GEMINI_API_KEY environment variable not set! AI features will not work.")
+
+    async def has_history(self, chat_id: int) -> bool:
+        return await self.history.contains(chat_id)
+
+    async def clear(self, chat_id: int) -> bool:
+        """Forget chat_id's conversation; returns False if there was none."""
+        if not await self.history.clear(chat_id):
+            return False
+        self.context_builder.forget(chat_id)
+        return True
+
+    async def cache_key(self, chat_id: int, query: str):
+        """Answer-cache key for query, or None when caching is off or the chat already has context."""
+        if self.answer_cache is None or await self.has_history(chat_id):
+            return None
+        return self.answer_cache.key(query, self.cache_context)
+
+    async def cached_answer(self, chat_id: int, query: str, cache_key: str):
+        """Return a cached answer (recording it in the chat's history), or None on a miss."""
+        text = self.answer_cache.get(cache_key)
+        if text is not None:
+            self.cache_hits += 1
+            await self._remember(chat_id, "user", query)
+            await self._remember(chat_id, "model", text)
+        return text
+
+    async def ask(self, chat_id: int, query: str, cache_key: str = None):
+        """Send query in chat_id's context and return the answer text (None if Gemini returned none)."""
+        payload = await self._build_payload(chat_id, query)
+        started = time.monotonic()
+        self.requests += 1
+        try:
+            data = await self.gemini.generate(payload)
+        except Exception:
+            self.errors += 1
+            GEMINI_ERRORS.inc(self._generate_labels)
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.total_latency += elapsed
+            GEMINI_SECONDS.observe(self._generate_labels, elapsed)
+
+        text = self.gemini.extract_text(data)
+        if text is None:
+            self.empty_responses += 1
+            return None
+        await self._remember_reply(chat_id, text, cache_key)
+        return text
+
+    async def ask_streaming(self, message: Message, query: str, cache_key: str = None, send=None) -> str:
+        """Answer query by streaming the reply into message's chat as it is generated."""
+        chat_id = message.chat.id
+        payload = await self._build_payload(chat_id, query)
+        started = time.monotonic()
+        self.requests += 1
+        try:
+            text = await stream_reply(message, self.gemini.stream(payload), send=send)
+        except Exception:
+            self.errors += 1
+            GEMINI_ERRORS.inc(self._stream_labels)
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.total_latency += elapsed
+            GEMINI_SECONDS.observe(self._stream_labels, elapsed)
+
+        if not text:
+            self.empty_responses += 1
+            return text
+        await self._remember_reply(chat_id, text, cache_key)
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "empty_responses": self.empty_responses,
+            "cache_hits": self.cache_hits,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "history": self.history.stats(),
+        }
+
+    def close(self):
+        self.history.close()
+        self.context_builder.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.save_soon()
+
+    async def _build_payload(self, chat_id: int, query: str) -> bytes:
+        if not self.enabled:
+            logging.error("❌ Cannot call Gemini API: GEMINI_API_KEY not configured")
+            raise Exception("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
+        await self._remember(chat_id, "user", query)
+        return self.context_builder.build(chat_id, self.preamble, await self.history.get(chat_id), GENERATION_CONFIG)
+
+    async def _remember(self, chat_id: int, role: str, text: str):
+        await self.history.append(chat_id, {"role": role, "parts": [{"text": text}]})
+
+    async def _remember_reply(self, chat_id: int, text: str, cache_key: str = None):
+        await self._remember(chat_id, "model", text)
+        if cache_key is not None:
+            self.answer_cache.put(cache_key, text)
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from .sqlite_writer import BatchedWriter
+
+
+TURN_OVERHEAD_BYTES = 64
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS conversations ("
+    "namespace TEXT NOT NULL, chat_id INTEGER NOT NULL, turns TEXT NOT NULL, updated REAL NOT NULL, "
+    "PRIMARY KEY (namespace, chat_id))",
+)
+
+
+def turn_size(turn: dict) -> int:
+    """Approximate resident size of one history turn in bytes."""
+    return TURN_OVERHEAD_BYTES + sum(len(part.get('text', '').encode('utf-8')) for part in turn.get('parts', []))
+
+
+class MemoryBudget:
+    """
+    Process-wide byte budget and LRU order for every ConversationStore.
+
+    All stores share one LRU of (store, chat_id); when the total resident
+    size goes over ``max_bytes``, or the least recently used chat has been
+    idle for ``idle_ttl``, chats are evicted from the head whichever bot
+    they belong to. A sweeper task repeats the idle check every
+    ``sweep_interval`` seconds so bots that went quiet still give memory
+    back. All bots share one event loop, which is the only caller, so
+    the LRU needs no lock.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, idle_ttl: float = 6 * 3600, sweep_interval: float = 60):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.resident_bytes = 0
+        self.evictions = 0
+        self._lru = OrderedDict()
+        self._stores = set()
+        self._sweeper = None
+
+    def register(self, store: 'ConversationStore'):
+        self._stores.add(store)
+        if self._sweeper is None or self._sweeper.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._sweeper = loop.create_task(self._sweep())
+
+    def unregister(self, store: 'ConversationStore'):
+        self._stores.discard(store)
+        if not self._stores and self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def touch(self, store, chat_id):
+        key = (store, chat_id)
+        self._lru[key] = time.monotonic()
+        self._lru.move_to_end(key)
+
+    def forget(self, store, chat_id):
+        self._lru.pop((store, chat_id), None)
+
+    def resize(self, delta: int):
+        self.resident_bytes += delta
+
+    def enforce(self):
+        """Evict idle chats from the LRU head, then the oldest chats until under budget."""
+        now = time.monotonic()
+        while self._lru:
+            (store, chat_id), last_used = next(iter(self._lru.items()))
+            if now - last_used < self.idle_ttl and self.resident_bytes <= self.max_bytes:
+                break
+            del self._lru[(store, chat_id)]
+            store._evict(chat_id)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "resident_chats": len(self._lru),
+            "resident_bytes": self.resident_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "stores": len(self._stores),
+        }
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.enforce()
+            except Exception as e:
+                logging.error(f"Conversation memory sweep failed: {e}")
+
+
+class ConversationStore:
+    """
+    Bounded per-chat conversation memory for one bot.
+
+    Resident histories count against the process-wide MemoryBudget;
+    chats it evicts are dropped, or handed to the spill database when one
+    is configured and reloaded the next time they are touched. Spill
+    writes are queued to a background writer and reads run in an
+    executor, so the event loop never waits on SQLite. Which chats are
+    spilled is kept in memory, so a miss for an unknown chat costs no I/O.
+    """
+
+    def __init__(self, namespace: str, max_turns: int = 50, budget: MemoryBudget = None,
+                 spill: BatchedWriter = None):
+        self.namespace = namespace
+        self.max_turns = max_turns
+        self.budget = budget or get_memory_budget()
+        self.spill = spill
+        self._chats = {}
+        self._bytes = {}
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.reloads = 0
+        self._spilled = None if spill is not None else set()
+        self._index = None
+        self.budget.register(self)
+
+    @classmethod
+    def from_env(cls, namespace: str, max_turns: int = 50):
+        return cls(namespace, max_turns=max_turns, spill=get_spill_db())
+
+    async def contains(self, chat_id) -> bool:
+        return chat_id in self._chats or chat_id in await self._spilled_ids()
+
+    async def get(self, chat_id):
+        """Return the chat's history deque (reloading it from disk if spilled), or None."""
+        history = await self._load(chat_id)
+        self.budget.enforce()
+        return history
+
+    async def create(self, chat_id, turns=()):
+        """Start a fresh history for chat_id seeded with turns (forgetting any spilled one)."""
+        history = await self._create(chat_id, turns)
+        self.budget.enforce()
+        return history
+
+    async def append(self, chat_id, turn: dict):
+        # Enforce only once the turn is accounted: the budget may evict (and spill) this very chat
+        history = await self._load(chat_id)
+        if history is None:
+            history = await self._create(chat_id)
+        if len(history) == history.maxlen:
+            self._account(chat_id, -turn_size(history[0]))
+        history.append(turn)
+        self._account(chat_id, turn_size(turn))
+        self.budget.enforce()
+
+    async def _load(self, chat_id):
+        history = self._chats.get(chat_id)
+        if history is not None:
+            self.budget.touch(self, chat_id)
+            return history
+        if chat_id not in await self._spilled_ids():
+            return None
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, self.spill.read, "SELECT turns FROM conversations WHERE namespace = ? AND chat_id = ?",
+            (self.namespace, chat_id))
+        # Another task may have reloaded or cleared the chat while we were reading
+        if chat_id in self._chats:
+            return await self._load(chat_id)
+        if not rows or chat_id not in self._spilled:
+            return None
+        self._spilled.discard(chat_id)
+        self.reloads += 1
+        logging.info(f"💾 Reloaded conversation for chat {chat_id} from disk")
+        history = deque(json.loads(rows[0][0]), maxlen=self.max_turns)
+        self._admit(chat_id, history)
+        return history
+
+    async def _create(self, chat_id, turns=()):
+        await self.clear(chat_id)
+        history = deque(turns, maxlen=self.max_turns)
+        self._admit(chat_id, history)
+        return history
+
+    async def clear(self, chat_id) -> bool:
+        """Forget chat_id both in memory and on disk; returns False if nothing was known about it."""
+        spilled = await self._spilled_ids()
+        known = chat_id in self._chats
+        if known:
+            self._drop(chat_id)
+        if chat_id in spilled:
+            spilled.discard(chat_id)
+            self.spill.submit("DELETE FROM conversations WHERE namespace = ? AND chat_id = ?",
+                              (self.namespace, chat_id))
+            known = True
+        return known
+
+    def clear_all(self):
+        for chat_id in list(self._chats):
+            self._drop(chat_id)
+
+    def stats(self) -> dict:
+        stats = {
+            "resident_chats": len(self._chats),
+            "resident_bytes": self.resident_bytes,
+            "max_bytes": self.budget.max_bytes,
+            "budget_bytes": self.budget.resident_bytes,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+        }
+        if self.spill is not None and self._spilled is not None:
+            stats["spilled_chats"] = len(self._spilled)
+        return stats
+
+    def close(self):
+        """Spill every resident chat (queued, not awaited) and leave the budget."""
+        if self.spill is not None:
+            for chat_id in list(self._chats):
+                self._write_spill(chat_id)
+        self.clear_all()
+        self.budget.unregister(self)
+
+    async def _spilled_ids(self) -> set:
+        """
+        Chat ids this namespace has on disk; read once per store, in an
+        executor. Every path that makes a chat resident awaits this first,
+        so evictions always find the set loaded.
+        """
+        if self._spilled is None:
+            if self._index is None:
+                self._index = asyncio.get_running_loop().run_in_executor(
+                    None, self.spill.read, "SELECT chat_id FROM conversations WHERE namespace = ?",
+                    (self.namespace,))
+            rows = await self._index
+            if self._spilled is None:
+                self._spilled = {row[0] for row in rows} - set(self._chats)
+        return self._spilled
+
+    def _admit(self, chat_id, history):
+        self._chats[chat_id] = history
+        size = sum(turn_size(turn) for turn in history)
+        self._bytes[chat_id] = size
+        self._resize(size)
+        self.budget.touch(self, chat_id)
+
+    def _account(self, chat_id, delta: int):
+        self._bytes[chat_id] += delta
+        self._resize(delta)
+
+    def _resize(self, delta: int):
+        self.resident_bytes += delta
+        self.budget.resize(delta)
+
+    def _drop(self, chat_id):
+        del self._chats[chat_id]
+        self._resize(-self._bytes.pop(chat_id))
+        self.budget.forget(self, chat_id)
+
+    def _evict(self, chat_id):
+        """Called by the budget after it removed chat_id from its LRU."""
+        if chat_id not in self._chats:
+            return
+        if self.spill is not None:
+            self._write_spill(chat_id)
+            self._spilled.add(chat_id)
+        del self._chats[chat_id]
+        self._resize(-self._bytes.pop(chat_id))
+        self.evictions += 1
+
+    def _write_spill(self, chat_id):
+        turns = json.dumps(list(self._chats[chat_id]), ensure_ascii=False, separators=(',', ':'))
+        self.spill.submit("INSERT OR REPLACE INTO conversations (namespace, chat_id, turns, updated) VALUES (?, ?, ?, ?)",
+                          (self.namespace, chat_id, turns, time.time()))
+
+
+_budget = None
+_spill_db = None
+_shared_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Process-wide budget (CONVERSATION_MAX_BYTES, CONVERSATION_IDLE_TTL, CONVERSATION_SWEEP_INTERVAL)."""
+    global _budget
+    with _shared_lock:
+        if _budget is None:
+            _budget = MemoryBudget(
+                max_bytes=int(os.getenv('CONVERSATION_MAX_BYTES', str(32 * 1024 * 1024))),
+                idle_ttl=float(os.getenv('CONVERSATION_IDLE_TTL', str(6 * 3600))),
+                sweep_interval=float(os.getenv('CONVERSATION_SWEEP_INTERVAL', '60')),
+            )
+        return _budget
+
+
+def get_spill_db():
+    """Process-wide spill writer for CONVERSATION_SPILL_DB, or None when spilling is off."""
+    global _spill_db
+    path = os.getenv('CONVERSATION_SPILL_DB')
+    if not path:
+        return None
+    with _shared_lock:
+        if _spill_db is None:
+            _spill_db = BatchedWriter(path, SCHEMA, name='conversation-spill')
+        return _spill_db
@@ -1,50 +1,34 @@
-import os
 import logging
 import requests
-from collections import deque
-from pyrogram import filters
 from pyrogram.types import Message
 from pyrogram.enums import ChatAction
 from .base_module import BaseModule
 
 
 class GeminiAIModule(BaseModule):
-    def __init__(self, client, socketio):
-        super().__init__(client, socketio)
-        self.api_key = os.getenv('GEMINI_API_KEY', '')
-        if not self.api_key:
-            logging.error("❌ GEMINI_API_KEY environment variable not set! AI features will not work.")
-            self.api_url = None
-            self.enabled = False
-        else:
-            self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.api_key}"
-            self.enabled = True
-
-        self.conversation_history = {} 
-        self.max_history_length = 50
-
-        if self.api_key:
+    def __init__(self, client, socketio, conversation=None, outbound=None, router=None, sent=None):
+        super().__init__(client, socketio, conversation, outbound, router, sent)
+        self.enabled = self.conversation is not None and self.conversation.enabled
+
+        if self.enabled:
             logging.info("✅ Gemini AI: Using API key from environment variables")
 
     def setup(self):
-        gem_filter = filters.private & filters.incoming & filters.regex(r"^/gem\b")
-        clear_filter = filters.private & filters.incoming & filters.command("clear")
-
-        @self.client.on_message(clear_filter)
-        async def handle_clear_command(client, message: Message):
+        async def handle_clear_command(message: Message, args: str):
             chat_id = message.chat.id
-            if chat_id in self.conversation_history:
-                self.conversation_history[chat_id].clear()
-                await message.reply_text("✅ **Conversation history cleared!**\n\nনতুন কথোপকথন শুরু হবে এখন থেকে। 🔄")
+            if self.conversation is not None and await self.conversation.clear(chat_id):
+                text = "✅ **Conversation history cleared!**\n\nনতুন কথোপকথন শুরু হবে এখন থেকে। 🔄"
+                await self.dispatch(chat_id, lambda: message.reply_text(text), text=text)
                 logging.info(f"🗑️ Conversation history cleared for {message.from_user.first_name}")
                 self.emit_terminal(f'🗑️ History cleared for {message.from_user.first_name}')
             else:
-                await message.reply_text("ℹ️ কোন conversation history নেই এই chat এ।")
+                text = "ℹ️ কোন conversation history নেই এই chat এ।"
+                await self.dispatch(chat_id, lambda: message.reply_text(text), text=text)
 
-        @self.client.on_message(gem_filter)
-        async def handle_gemini_command(client, message: Message):
+        async def handle_gemini_command(message: Message, args: str):
+            chat_id = message.chat.id
             if not self.enabled:
-                await message.reply_text(
+                text = (
                     "⚠️ **AI Features Disabled**\n\n"
                     "Gemini AI is currently unavailable because GEMINI_API_KEY environment variable is not configured.\n\n"
                     "**To enable AI features:**\n"
@@ -52,105 +36,68 @@ class GeminiAIModule(BaseModule):
                     "2. Set it as GEMINI_API_KEY environment variable\n"
                     "3. Restart the bot"
                 )
+                await self.dispatch(chat_id, lambda: message.reply_text(text), text=text)
                 logging.warning(f"⚠️ {message.from_user.first_name} tried to use /gem but AI is disabled")
                 self.emit_terminal(f'⚠️ AI unavailable - {message.from_user.first_name} tried /gem')
                 return
 
-            if message.text and message.text.startswith('/gem'):
-                user_query = message.text[4:].strip()
-
-                if not user_query:
-                    await message.reply_text(
-                        "❓ **ব্যবহার করার নিয়ম:**\n"
-                        "/gem আপনার প্রশ্ন লিখুন\n\n"
-                        "**উদাহরণ:**\n"
-                        "/gem হাই, তুমি কেমন আছো?\n"
-                        "/gem What is artificial intelligence?"
-                    )
+            user_query = args
+
+            if not user_query:
+                text = (
+                    "❓ **ব্যবহার করার নিয়ম:**\n"
+                    "/gem আপনার প্রশ্ন লিখুন\n\n"
+                    "**উদাহরণ:**\n"
+                    "/gem হাই, তুমি কেমন আছো?\n"
+                    "/gem What is artificial intelligence?"
+                )
+                await self.dispatch(chat_id, lambda: message.reply_text(text), text=text)
+                return
+
+            logging.info(f"🤖 Gemini AI request from {message.from_user.first_name}: {user_query[:100]}")
+            self.emit_terminal(f'🤖 Gemini AI processing: "{user_query[:50]}..."')
+
+            cache_key = await self.conversation.cache_key(chat_id, user_query)
+            if cache_key is not None:
+                cached_text = await self.conversation.cached_answer(chat_id, user_query, cache_key)
+                if cached_text is not None:
+                    await self.dispatch(chat_id, lambda: message.reply_text(cached_text), text=cached_text)
+                    logging.info(f"⚡ Served cached Gemini answer to {message.from_user.first_name}")
+                    self.emit_terminal(f'⚡ Cached answer sent to {message.from_user.first_name}')
                     return
 
-                logging.info(f"🤖 Gemini AI request from {message.from_user.first_name}: {user_query[:100]}")
-                self.emit_terminal(f'🤖 Gemini AI processing: "{user_query[:50]}..."')
-
-                await client.send_chat_action(message.chat.id, ChatAction.TYPING)
-
-                try:
-                    response_text = await self._call_gemini_api(user_query, message.chat.id)
-
-                    await message.reply_text(response_text)
-
-                    logging.info(f"✅ Gemini AI responded to {message.from_user.first_name}")
-                    self.emit_terminal(f'✅ Gemini AI responded successfully to {message.from_user.first_name}')
-
-                except Exception as e:
-                    error_msg = f"❌ দুঃখিত, Gemini AI এ সমস্যা হয়েছে।\n\nError: {str(e)}"
-                    logging.error(f"Gemini AI error: {e}", exc_info=True)
-                    await message.reply_text(error_msg)
-                    self.emit_terminal(f'❌ Gemini AI error: {str(e)}')
-
-    async def _call_gemini_api(self, query: str, chat_id: int) -> str:
-        if not self.api_url:
-            logging.error("❌ Cannot call Gemini API: GEMINI_API_KEY not configured")
-            raise Exception("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
-
-        if chat_id not in self.conversation_history:
-            self.conversation_history[chat_id] = deque(maxlen=self.max_history_length)
-            system_prompt = {
-                "role": "user",
-                "parts": [{
-                    "text": "You are a helpful AI assistant. Language guidelines:\n"
-                            "- If the user writes in Bengali (বাংলা) or uses English letters to write Bengali (Banglish/Roman Bengali), respond in Bengali (বাংলা script)\n"
-                            "- If the user writes in English, respond in English\n"
-                            "- If the user writes in any other language, respond in English\n"
-                            "- Be natural, friendly, and helpful in your responses"
-                }]
-            }
-            model_ack = {
-                "role": "model",
-                "parts": [{"text": "আমি বুঝেছি! আমি বাংলা বা ইংরেজিতে সাহায্য করতে পারি। কিভাবে সাহায্য করতে পারি?"}]
-            }
-            self.conversation_history[chat_id].append(system_prompt)
-            self.conversation_history[chat_id].append(model_ack)
-
-        user_message = {
-            "role": "user",
-            "parts": [{"text": query}]
-        }
-        self.conversation_history[chat_id].append(user_message)
-
-        payload = {
-            "contents": list(self.conversation_history[chat_id])
-        }
-
-        headers = {
-            "Content-Type": "application/json"
-        }
+            await self.dispatch(chat_id, lambda: self.client.send_chat_action(chat_id, ChatAction.TYPING))
+
+            try:
+                if self.conversation.streaming:
+                    response_text = await self.conversation.ask_streaming(
+                        message, user_query, cache_key, send=lambda text, call: self.dispatch(chat_id, call, text=text))
+                    if not response_text:
+                        text = "❌ দুঃখিত, Gemini থেকে সঠিক উত্তর পাওয়া যায়নি।"
+                        await self.dispatch(chat_id, lambda: message.reply_text(text), text=text)
+                else:
+                    response_text = await self._call_gemini_api(user_query, message.chat.id, cache_key)
+
+                    await self.dispatch(chat_id, lambda: message.reply_text(response_text), text=response_text)
+
+                logging.info(f"✅ Gemini AI responded to {message.from_user.first_name}")
+                self.emit_terminal(f'✅ Gemini AI responded successfully to {message.from_user.first_name}')
+
+            except Exception as e:
+                error_msg = f"❌ দুঃখিত, Gemini AI এ সমস্যা হয়েছে।\n\nError: {str(e)}"
+                logging.error(f"Gemini AI error: {e}", exc_info=True)
+                await self.dispatch(chat_id, lambda: message.reply_text(error_msg), text=error_msg)
+                self.emit_terminal(f'❌ Gemini AI error: {str(e)}')
+
+        self.on_command("clear", handle_clear_command)
+        self.on_command("gem", handle_gemini_command)
 
+    async def _call_gemini_api(self, query: str, chat_id: int, cache_key: str = None) -> str:
+        """Ask the shared conversation engine, turning API failures into user-facing messages."""
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-
-            response.raise_for_status()
-            data = response.json()
-
-            if 'candidates' in data and len(data['candidates']) > 0:
-                candidate = data['candidates'][0]
-                if 'content' in candidate and 'parts' in candidate['content']:
-                    parts = candidate['content']['parts']
-                    if len(parts) > 0 and 'text' in parts[0]:
-                        ai_response = parts[0]['text']
-
-                        model_message = {
-                            "role": "model",
-                            "parts": [{"text": ai_response}]
-                        }
-                        self.conversation_history[chat_id].append(model_message)
-
-                        return ai_response
+            ai_response = await self.conversation.ask(chat_id, query, cache_key)
+            if ai_response is not None:
+                return ai_response
             return "❌ দুঃখিত, Gemini থেকে সঠিক উত্তর পাওয়া যায়নি।"
 
         except requests.exceptions.Timeout:
@@ -181,5 +128,4 @@ class GeminiAIModule(BaseModule):
 
     def cleanup(self):
         self.enabled = False
-        self.conversation_history.clear()
         logging.info("Gemini AI module cleaned up")
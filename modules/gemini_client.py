@@ -0,0 +1,143 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+
+class GeminiClient:
+    """
+    Shared Gemini HTTP client.
+
+    Calls run on a small dedicated thread pool over one keep-alive
+    ``requests.Session``, so a slow API never blocks the shared event loop.
+    The pool size is the concurrency cap; extra calls queue up behind it.
+    """
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, api_base: str = DEFAULT_API_BASE,
+                 max_concurrency: int = 16, timeout: float = 30):
+        self.api_key = api_key
+        self.model = model
+        self.api_base = api_base.rstrip('/')
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        self._session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gemini')
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def api_url(self):
+        if not self.api_key:
+            return None
+        return f"{self.api_base}/models/{self.model}:generateContent?key={self.api_key}"
+
+    @property
+    def stream_url(self):
+        if not self.api_key:
+            return None
+        return f"{self.api_base}/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+
+    def _post(self, payload) -> dict:
+        if isinstance(payload, bytes):
+            response = self._session.post(self.api_url, data=payload, timeout=self.timeout)
+        else:
+            response = self._session.post(self.api_url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def generate(self, payload) -> dict:
+        """POST a generateContent payload (dict or pre-encoded JSON bytes) and return the decoded response."""
+        if not self.api_url:
+            raise Exception("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._post, payload)
+
+    async def stream(self, payload):
+        """Yield response text chunks from streamGenerateContent as they arrive."""
+        if not self.stream_url:
+            raise Exception("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        finished = object()
+        abandoned = threading.Event()
+
+        def pump():
+            try:
+                kwargs = {"data": payload} if isinstance(payload, bytes) else {"json": payload}
+                with self._session.post(self.stream_url, stream=True, timeout=self.timeout, **kwargs) as response:
+                    response.raise_for_status()
+                    # SSE is always UTF-8; the Content-Type carries no charset, so requests would guess Latin-1
+                    for line in response.iter_lines():
+                        if abandoned.is_set():
+                            return
+                        if not line.startswith(b'data:'):
+                            continue
+                        text = self.extract_text(json.loads(line[5:].decode('utf-8')))
+                        if text:
+                            loop.call_soon_threadsafe(chunks.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+                return
+            loop.call_soon_threadsafe(chunks.put_nowait, finished)
+
+        loop.run_in_executor(self._executor, pump)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            abandoned.set()
+
+    @staticmethod
+    def extract_text(data: dict):
+        """Return the first candidate's text, or None if the response has none."""
+        candidates = data.get('candidates') or []
+        if not candidates:
+            return None
+        parts = candidates[0].get('content', {}).get('parts') or []
+        if parts and 'text' in parts[0]:
+            return parts[0]['text']
+        return None
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    """Return the process-wide Gemini client, creating it from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient(
+                api_key=os.getenv('GEMINI_API_KEY', ''),
+                model=os.getenv('GEMINI_MODEL', DEFAULT_MODEL),
+                api_base=os.getenv('GEMINI_API_BASE', DEFAULT_API_BASE),
+                max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', '16')),
+                timeout=float(os.getenv('GEMINI_TIMEOUT', '30')),
+            )
+            logging.info(f"✅ Gemini client ready (model={_client.model}, max_concurrency={_client.max_concurrency})")
+        return _client
@@ -0,0 +1,178 @@
+import time
+import bisect
+import asyncio
+import functools
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, labels=(), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self):
+        samples = [('', dict(zip(self.labelnames, labels)), value) for labels, value in self.values.items()]
+        return self.name, 'counter', self.help, samples
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by a tuple of label values.
+
+    observe() is one dict lookup, one bisect and two additions; buckets
+    are only made cumulative when collected.
+    """
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, labels, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def collect(self):
+        samples = []
+        for labels, (counts, total) in self.series.items():
+            base = dict(zip(self.labelnames, labels))
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                samples.append(('_bucket', {**base, 'le': repr(float(bound))}, running))
+            running += counts[-1]
+            samples.append(('_bucket', {**base, 'le': '+Inf'}, running))
+            samples.append(('_sum', base, total))
+            samples.append(('_count', base, running))
+        return self.name, 'histogram', self.help, samples
+
+
+class Registry:
+    """Process-wide set of metrics plus collectors that produce families on demand."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """collector() returns an iterable of (name, type, help, samples) families."""
+        self._collectors.append(collector)
+
+    def collect(self) -> list:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(families) -> str:
+    """Prometheus text exposition; families sharing a name are merged under one HELP/TYPE header."""
+    merged = {}
+    for name, kind, help, samples in families:
+        family = merged.get(name)
+        if family is None:
+            merged[name] = family = (kind, help, [])
+        family[2].extend(samples)
+
+    lines = []
+    for name, (kind, help, samples) in merged.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            if labels:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name}{suffix} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def with_labels(families, **extra):
+    """Copy families with extra labels added to every sample (e.g. the shard a snapshot came from)."""
+    return [(name, kind, help, [(suffix, {**labels, **extra}, value) for suffix, labels, value in samples])
+            for name, kind, help, samples in families]
+
+
+def timed(histogram: Histogram, labels: tuple):
+    """Decorator recording an async function's wall time into histogram under labels."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram.observe(labels, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self, loop):
+        return asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, self.lag)
+            LOOP_LAG.observe((), self.lag)
+
+    def collect(self):
+        return [
+            ('userbot_event_loop_lag_last_seconds', 'gauge', 'Most recent event loop wake-up delay',
+             [('', {}, self.lag)]),
+            ('userbot_event_loop_lag_max_seconds', 'gauge', 'Largest event loop wake-up delay seen',
+             [('', {}, self.max_lag)]),
+        ]
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.histogram(
+    'userbot_handler_seconds', 'Time spent in message handlers', ('bot', 'module', 'handler'))
+GEMINI_SECONDS = REGISTRY.histogram(
+    'userbot_gemini_request_seconds', 'Gemini call latency', ('bot', 'mode'),
+    buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0))
+GEMINI_ERRORS = REGISTRY.counter(
+    'userbot_gemini_errors_total', 'Gemini calls that raised', ('bot', 'mode'))
+LOOP_LAG = REGISTRY.histogram(
+    'userbot_event_loop_lag_seconds', 'Event loop wake-up delay',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
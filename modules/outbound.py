@@ -0,0 +1,175 @@
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+from pyrogram.errors import FloodWait
+
+
+# Lower value = served first when the account's send budget is contended
+PRIORITY_INTERACTIVE = 0
+PRIORITY_AWAY = 1
+
+
+class TokenBucket:
+    """Classic token bucket; time is passed in so the caller's clock (the event loop's) is used."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = None
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def reserve(self, now: float) -> float:
+        """Take a token now, going into debt if needed; returns how long to wait before using it."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class OutboundDispatcher:
+    """
+    Paces one account's outbound Telegram calls.
+
+    Every send first waits its turn in its chat's token bucket (so a chat
+    keeps its order), then for a token from the account-wide bucket, which
+    is handed out in priority order. A FloodWait pauses the whole account
+    for the requested time and the send is retried.
+    """
+
+    def __init__(self, chat_rate: float = 1.0, chat_burst: float = 3, account_rate: float = 20.0,
+                 account_burst: float = 20, max_retries: int = 3, max_flood_wait: float = 300,
+                 max_idle_chats: int = 1024):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.account = TokenBucket(account_rate, account_burst)
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        self.max_idle_chats = max_idle_chats
+
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+
+        self._chats = {}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup = None
+        self._task = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            chat_rate=float(os.getenv('OUTBOUND_CHAT_RATE', '1')),
+            chat_burst=float(os.getenv('OUTBOUND_CHAT_BURST', '3')),
+            account_rate=float(os.getenv('OUTBOUND_ACCOUNT_RATE', '20')),
+            account_burst=float(os.getenv('OUTBOUND_ACCOUNT_BURST', '20')),
+            max_retries=int(os.getenv('OUTBOUND_MAX_RETRIES', '3')),
+            max_flood_wait=float(os.getenv('OUTBOUND_MAX_FLOOD_WAIT', '300')),
+        )
+
+    async def send(self, chat_id, call, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Run call() (a zero-argument coroutine function such as
+        ``lambda: message.reply_text(text)``) once the chat and account
+        budgets allow, and return its result.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            wait = self._chat_bucket(chat_id, loop.time()).reserve(loop.time())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._acquire(priority)
+            try:
+                result = await call()
+            except FloodWait as e:
+                self.flood_waits += 1
+                if e.value > self.max_flood_wait or attempt == self.max_retries:
+                    self.failed += 1
+                    raise
+                logging.warning(f"⏳ FloodWait {e.value}s on chat {chat_id} - pausing outbound sends, retry {attempt + 1}")
+                self._paused_until = max(self._paused_until, loop.time() + e.value)
+                continue
+            except Exception:
+                self.failed += 1
+                raise
+            self.sent += 1
+            return result
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "flood_waits": self.flood_waits,
+            "queued": self.queue_depth(),
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, _, waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
+        self._chats.clear()
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_idle_chats:
+                # Full buckets carry no state worth keeping
+                for key in [key for key, idle in self._chats.items() if idle.full(now)]:
+                    del self._chats[key]
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _acquire(self, priority: int):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._grant())
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._wakeup.set()
+        await waiter
+
+    async def _grant(self):
+        """Hand out account tokens to waiters, highest priority first."""
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = loop.time()
+            wait = max(self._paused_until - now, self.account.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self.account.consume(now)
+            _, _, waiter = heapq.heappop(self._waiters)
+            waiter.set_result(None)
@@ -0,0 +1,142 @@
+import os
+import asyncio
+import threading
+from .sqlite_writer import BatchedWriter
+
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS pending_replies ("
+    "namespace TEXT NOT NULL, chat_id INTEGER NOT NULL, message_id INTEGER NOT NULL, "
+    "deadline REAL NOT NULL, name TEXT, PRIMARY KEY (namespace, chat_id))",
+    "CREATE TABLE IF NOT EXISTS pending_group_replies ("
+    "namespace TEXT NOT NULL, chat_id INTEGER NOT NULL, message_id INTEGER NOT NULL, "
+    "deadline REAL NOT NULL, name TEXT, PRIMARY KEY (namespace, chat_id, message_id))",
+    "CREATE TABLE IF NOT EXISTS conversation_mode ("
+    "namespace TEXT NOT NULL, chat_id INTEGER NOT NULL, PRIMARY KEY (namespace, chat_id))",
+)
+
+
+class ReplyStateStore(BatchedWriter):
+    """
+    Durable home for auto-reply state (pending away messages, pending group
+    replies, active conversation modes).
+
+    Writes are queued and applied by one background thread that groups
+    everything arriving within ``flush_interval`` into a single SQLite
+    transaction (WAL mode), so callers on the event loop never wait on disk.
+    Rows are keyed by namespace, one per bot account.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.2, max_batch: int = 1000):
+        super().__init__(path, SCHEMA, flush_interval, max_batch, name='reply-state')
+
+    def view(self, namespace: str) -> 'ReplyState':
+        return ReplyState(self, namespace)
+
+    def load(self, namespace: str):
+        """Return (pending, group_pending, conversations) rows for namespace. Blocks until queued writes commit."""
+        self.flush()
+        pending = self.read(
+            "SELECT chat_id, message_id, deadline, name FROM pending_replies WHERE namespace = ?",
+            (namespace,), flush=False)
+        group_pending = self.read(
+            "SELECT chat_id, message_id, deadline, name FROM pending_group_replies WHERE namespace = ?",
+            (namespace,), flush=False)
+        conversations = [row[0] for row in self.read(
+            "SELECT chat_id FROM conversation_mode WHERE namespace = ?", (namespace,), flush=False)]
+        return pending, group_pending, conversations
+
+
+class ReplyState:
+    """One bot's write-through view of the ReplyStateStore."""
+
+    def __init__(self, store: ReplyStateStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
+        # Chats written while a load() is in flight (None = every chat); their saved rows are stale
+        self._touched = None
+
+    def _touch(self, chat_id):
+        if self._touched is not None:
+            self._touched.add(chat_id)
+
+    def set_pending(self, chat_id: int, message_id: int, deadline: float, name: str = None):
+        self._touch(chat_id)
+        self.store.submit("INSERT OR REPLACE INTO pending_replies VALUES (?, ?, ?, ?, ?)",
+                          (self.namespace, chat_id, message_id, deadline, name))
+
+    def drop_pending(self, chat_id: int = None):
+        self._touch(chat_id)
+        if chat_id is None:
+            self.store.submit("DELETE FROM pending_replies WHERE namespace = ?", (self.namespace,))
+        else:
+            self.store.submit("DELETE FROM pending_replies WHERE namespace = ? AND chat_id = ?",
+                              (self.namespace, chat_id))
+
+    def add_group_pending(self, chat_id: int, message_id: int, deadline: float, name: str = None):
+        self._touch(chat_id)
+        self.store.submit("INSERT OR REPLACE INTO pending_group_replies VALUES (?, ?, ?, ?, ?)",
+                          (self.namespace, chat_id, message_id, deadline, name))
+
+    def drop_group_pending(self, chat_id: int, message_id: int = None):
+        self._touch(chat_id)
+        if message_id is None:
+            self.store.submit("DELETE FROM pending_group_replies WHERE namespace = ? AND chat_id = ?",
+                              (self.namespace, chat_id))
+        else:
+            self.store.submit("DELETE FROM pending_group_replies WHERE namespace = ? AND chat_id = ? AND message_id = ?",
+                              (self.namespace, chat_id, message_id))
+
+    def set_conversation(self, chat_id: int):
+        self._touch(chat_id)
+        self.store.submit("INSERT OR IGNORE INTO conversation_mode VALUES (?, ?)", (self.namespace, chat_id))
+
+    def drop_conversation(self, chat_id: int = None):
+        self._touch(chat_id)
+        if chat_id is None:
+            self.store.submit("DELETE FROM conversation_mode WHERE namespace = ?", (self.namespace,))
+        else:
+            self.store.submit("DELETE FROM conversation_mode WHERE namespace = ? AND chat_id = ?",
+                              (self.namespace, chat_id))
+
+    def drop_all(self):
+        """Forget every saved pending reply, group reply and conversation mode of this bot."""
+        self._touch(None)
+        for table in ('pending_replies', 'pending_group_replies', 'conversation_mode'):
+            self.store.submit(f"DELETE FROM {table} WHERE namespace = ?", (self.namespace,))
+
+    async def load(self):
+        """
+        Read this bot's saved rows in an executor, since the store first waits
+        for queued writes to commit. Rows for chats written through this view
+        while the read was in flight are left out: their live state is newer.
+        """
+        self._touched = set()
+        try:
+            pending, group_pending, conversations = await asyncio.get_running_loop().run_in_executor(
+                None, self.store.load, self.namespace)
+            touched = self._touched
+        finally:
+            self._touched = None
+        if None in touched:
+            return [], [], []
+        return ([row for row in pending if row[0] not in touched],
+                [row for row in group_pending if row[0] not in touched],
+                [chat_id for chat_id in conversations if chat_id not in touched])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_reply_state_store() -> ReplyStateStore:
+    """Return the process-wide auto-reply state store (REPLY_STATE_DB, default session/reply_state.db)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = os.getenv('REPLY_STATE_DB', os.path.join('session', 'reply_state.db'))
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _store = ReplyStateStore(path, flush_interval=float(os.getenv('REPLY_STATE_FLUSH_MS', '200')) / 1000)
+        return _store
@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+import contextlib
+from collections import OrderedDict
+
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = '?!.।,;: '
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation so trivially different questions match."""
+    return _WHITESPACE.sub(' ', text.casefold()).strip().rstrip(_TRAILING_PUNCTUATION)
+
+
+def fingerprint(*parts) -> str:
+    """Stable digest of whatever context an answer depends on (system prompt, model, ...)."""
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Size- and TTL-bounded answer cache keyed on normalized query text plus
+    a context fingerprint. Entries are kept in LRU order and, when a path
+    is given, saved to a JSON file so they survive restarts. Saves
+    triggered on the event loop run in an executor.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 24 * 3600, path: str = None, save_every: int = 20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self._load()
+
+    def key(self, query: str, context: str) -> str:
+        return hashlib.sha1(f"{context}\0{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, answer: str):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+            if should_save:
+                # Reset now rather than in save(), which may not run until the executor gets to it
+                self._unsaved = 0
+        if should_save:
+            self.save_soon()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save_soon(self):
+        """Save from a worker thread when called on an event loop, inline otherwise."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        loop.run_in_executor(None, self.save)
+
+    def save(self):
+        if not self.path:
+            return
+        # Saves run one at a time, so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                now = time.time()
+                snapshot = [[key, expires, answer] for key, (expires, answer) in self._entries.items() if expires > now]
+                self._unsaved = 0
+            tmp_path = None
+            try:
+                # A unique file next to the target, so other processes sharing the path never write into ours
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                                dir=os.path.dirname(os.path.abspath(self.path)))
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.error(f"Failed to save response cache: {e}")
+                if tmp_path is not None:
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable response cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, expires, answer in snapshot[-self.max_entries:]:
+            if expires > now:
+                self._entries[key] = (expires, answer)
+        logging.info(f"💾 Loaded {len(self._entries)} cached /gem answers")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide /gem answer cache, or None unless GEM_CACHE_ENABLED is set."""
+    global _cache
+    if os.getenv('GEM_CACHE_ENABLED', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                max_entries=int(os.getenv('GEM_CACHE_SIZE', '1000')),
+                ttl=float(os.getenv('GEM_CACHE_TTL', str(24 * 3600))),
+                path=os.getenv('GEM_CACHE_PATH', 'gem_cache.json') or None,
+            )
+        return _cache
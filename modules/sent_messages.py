@@ -0,0 +1,92 @@
+import time
+import hashlib
+from collections import OrderedDict
+
+
+def _text_key(text: str) -> bytes:
+    # Telegram strips Markdown/HTML markers from what it echoes back, so compare on letters and digits only
+    normalized = ''.join(ch for ch in text or '' if ch.isalnum())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+
+class SentMessages:
+    """
+    Remembers messages this bot sent itself so their outgoing updates are
+    not mistaken for the owner's manual replies.
+
+    A send registers a (chat_id, text) nonce before the API call and the
+    returned message id after it; the outgoing update may arrive on either
+    side of that, and matches whichever is present. Entries expire after
+    ttl seconds. The bot manager creates one per bot and hands it to
+    every module, so a send by any of them is recognised by all.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._ids = OrderedDict()
+        self._nonces = {}
+
+    async def track(self, chat_id: int, text: str, call):
+        """Await call() (which sends text to chat_id) with its echo marked as our own."""
+        key = (chat_id, _text_key(text))
+        self._expect(key)
+        try:
+            sent = await call()
+        except BaseException:
+            self._consume(key)
+            raise
+        message_id = getattr(sent, 'id', None)
+        if message_id is not None:
+            self._record(chat_id, message_id)
+        return sent
+
+    def is_own(self, message) -> bool:
+        chat_id = message.chat.id
+        key = (chat_id, _text_key(message.text or message.caption))
+        if self._ids.pop((chat_id, message.id), None) is not None:
+            self._consume(key)
+            return True
+        return self._consume(key)
+
+    def clear(self):
+        self._ids.clear()
+        self._nonces.clear()
+
+    def _expect(self, key):
+        expires = time.monotonic() + self.ttl
+        entry = self._nonces.get(key)
+        if entry is None:
+            if len(self._nonces) >= self.max_entries:
+                self._prune_nonces()
+            self._nonces[key] = [1, expires]
+        else:
+            entry[0] += 1
+            entry[1] = expires
+
+    def _consume(self, key) -> bool:
+        entry = self._nonces.get(key)
+        if entry is None:
+            return False
+        if entry[1] < time.monotonic():
+            del self._nonces[key]
+            return False
+        entry[0] -= 1
+        if entry[0] <= 0:
+            del self._nonces[key]
+        return True
+
+    def _record(self, chat_id: int, message_id: int):
+        now = time.monotonic()
+        self._ids[(chat_id, message_id)] = now + self.ttl
+        self._ids.move_to_end((chat_id, message_id))
+        while self._ids:
+            oldest, expires = next(iter(self._ids.items()))
+            if expires >= now and len(self._ids) <= self.max_entries:
+                break
+            del self._ids[oldest]
+
+    def _prune_nonces(self):
+        now = time.monotonic()
+        for key in [key for key, (_, expires) in self._nonces.items() if expires < now]:
+            del self._nonces[key]
@@ -0,0 +1,199 @@
+import os
+import shutil
+import hashlib
+import logging
+import sqlite3
+import zipfile
+import tempfile
+import contextlib
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Spool:
+    """Write-only file object that hands whatever zipfile wrote back to the generator draining it."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile records header offsets from tell(); seek() is absent so it writes data descriptors
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b''.join(chunks)
+
+
+@contextlib.contextmanager
+def snapshot_session(path: str):
+    """
+    Yield the path of a consistent copy of the SQLite file at path.
+
+    The copy is made with SQLite's online backup API, so a session that a
+    running bot is writing to is captured between transactions rather than
+    mid-write. Files that are empty or not databases are yielded as-is.
+    """
+    if os.path.getsize(path) == 0:
+        yield path
+        return
+
+    fd, copy_path = tempfile.mkstemp(suffix='.session')
+    os.close(fd)
+    try:
+        try:
+            source = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+            try:
+                target = sqlite3.connect(copy_path)
+                try:
+                    # One step under a single read lock: a stepped backup restarts whenever the bot
+                    # commits, and session files are small enough that the bot barely waits
+                    source.backup(target, sleep=0.05)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        except sqlite3.DatabaseError as e:
+            logging.warning(f"Could not snapshot {path} through SQLite ({e}) - exporting the file as-is")
+            shutil.copyfile(path, copy_path)
+        yield copy_path
+    finally:
+        os.remove(copy_path)
+
+
+def stream_zip(entries, compression: int = zipfile.ZIP_DEFLATED, level: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield a ZIP archive of entries ((arcname, path) pairs) as it is built.
+
+    Each file is read chunk_size bytes at a time and every compressed
+    chunk is yielded straight away, so memory stays flat however large
+    the archive is and the first bytes go out before the last file is
+    read. SQLite session files are exported from a backup snapshot.
+    """
+    spool = _Spool()
+    with zipfile.ZipFile(spool, 'w', compression=compression, compresslevel=level) as archive:
+        for arcname, path in entries:
+            try:
+                with snapshot_session(path) as snapshot:
+                    size = os.path.getsize(snapshot)
+                    with open(snapshot, 'rb') as source, \
+                            archive.open(arcname, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as target:
+                        while True:
+                            chunk = source.read(chunk_size)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                            data = spool.drain()
+                            if data:
+                                yield data
+            except FileNotFoundError:
+                # Removed between listing and export
+                continue
+            data = spool.drain()
+            if data:
+                yield data
+    yield spool.drain()
+
+
+# Incoming session files are written next to their target under this suffix, then renamed into place
+STAGED_SUFFIX = '.upload'
+
+
+def _digest(source, chunk_size: int = CHUNK_SIZE) -> bytes:
+    digest = hashlib.blake2b(digest_size=32)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return digest.digest()
+        digest.update(chunk)
+
+
+def stage_sessions(archive: zipfile.ZipFile, session_dir: str) -> dict:
+    """
+    Compare the .session entries of archive with the files in session_dir.
+
+    Each entry is hashed first; only entries whose content differs from
+    (or is missing in) session_dir are then written to
+    ``<name>.session.upload`` and fsynced. Nothing is renamed yet, see
+    commit_staged(). If staging fails partway, files staged so far are
+    removed. Returns the diff as lists of file names: added, updated,
+    unchanged and skipped (unsafe or non-session entries).
+    """
+    diff = {"added": [], "updated": [], "unchanged": [], "skipped": []}
+    seen = set()
+    staged_paths = []
+    completed = False
+    try:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            name = os.path.basename(info.filename)
+            member_path = os.path.normpath(info.filename)
+            if (not name.endswith('.session') or name in seen or member_path.startswith('..')
+                    or os.path.isabs(member_path) or name.startswith('.')):
+                logging.warning(f"Skipping upload entry: {info.filename}")
+                diff["skipped"].append(info.filename)
+                continue
+            seen.add(name)
+
+            target_path = os.path.join(session_dir, name)
+            exists = os.path.exists(target_path)
+            if exists and os.path.getsize(target_path) == info.file_size:
+                with archive.open(info) as source:
+                    incoming = _digest(source)
+                with open(target_path, 'rb') as current:
+                    if _digest(current) == incoming:
+                        diff["unchanged"].append(name)
+                        continue
+
+            staged_path = target_path + STAGED_SUFFIX
+            staged_paths.append(staged_path)
+            with archive.open(info) as source, open(staged_path, 'wb') as staged:
+                shutil.copyfileobj(source, staged, CHUNK_SIZE)
+                staged.flush()
+                os.fsync(staged.fileno())
+            diff["updated" if exists else "added"].append(name)
+        completed = True
+    finally:
+        if not completed:
+            for staged_path in staged_paths:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(staged_path)
+    return diff
+
+
+def discard_staged(path: str) -> bool:
+    """Remove a staged upload for the session file at path that will not be committed."""
+    try:
+        os.remove(path + STAGED_SUFFIX)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def commit_staged(path: str) -> bool:
+    """
+    Atomically move a staged upload over the session file at path.
+
+    Only call this while no client has the session open: a leftover
+    rollback journal would otherwise be replayed against the new file, so
+    it is removed too. Returns False when nothing was staged.
+    """
+    staged_path = path + STAGED_SUFFIX
+    if not os.path.exists(staged_path):
+        return False
+    os.replace(staged_path, path)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path + '-journal')
+    return True
@@ -1,65 +1,73 @@
 import os
+import time
 import asyncio
 import logging
-from collections import deque
 from pyrogram import filters
 from pyrogram.types import Message
 from pyrogram.enums import ChatAction, UserStatus, ChatType
 from .base_module import BaseModule
+from .timer_wheel import TimerWheel
+from .outbound import PRIORITY_INTERACTIVE, PRIORITY_AWAY
+from .reply_state import get_reply_state_store
+
+
+# Saved replies whose deadline passed longer ago than this are dropped instead of sent late
+STALE_REPLY_AGE = 3600
 
 
 class SmartAutoReplyModule(BaseModule):
-    def __init__(self, client, socketio):
-        super().__init__(client, socketio)
+    def __init__(self, client, socketio, conversation=None, outbound=None, router=None, sent=None):
+        super().__init__(client, socketio, conversation, outbound, router, sent)
         self.pending_replies = {}
         self.conversation_mode = {}
 
-        if os.getenv('GEMINI_API_KEY', ''):
+        self.ai_enabled = self.conversation is not None and self.conversation.enabled
+
+        if self.ai_enabled:
             self.auto_reply_message = "𝑰 𝒎𝒂𝒚𝒃𝒆 𝒃𝒖𝒔𝒚 𝒏𝒐𝒘. 💝\n\n💬 আপনি চাইলে আমাকে কিছু জিজ্ঞাসা করতে পারেন, আমি AI দিয়ে উত্তর দেওয়ার চেষ্টা করব। \n 💝 𝑻𝒉𝒂𝒏𝒌 𝑼 💝"
         else:
             self.auto_reply_message = "𝑰 𝒎𝒂𝒚𝒃𝒆 𝒃𝒖𝒔𝒚 𝒏𝒐𝒘. 💝\n\n⚠️ Note: AI features are currently disabled (GEMINI_API_KEY not configured).\n\n 💝 𝑻𝒉𝒂𝒏𝒌 𝑼 💝"
 
-        self.programmatic_message_count = 0
-        self._programmatic_lock = asyncio.Lock()
-
         self.reply_timeout = 120  
         self.group_reply_timeout = 120  
-        self.conversation_history = {}  
-        self.max_history_length = 50
-        self.pending_group_replies = {}
 
-        self.api_key = os.getenv('GEMINI_API_KEY' , '')
-        if not self.api_key:
-            logging.error("❌ GEMINI_API_KEY environment variable not set! AI features will not work.")
-            self.api_url = None
-        else:
-            self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.api_key}"
+        # Conversation-mode bursts within the window are answered with a single AI call
+        self.batch_window = int(os.getenv('CONVERSATION_BATCH_MS', '1500')) / 1000
+        self.batch_max_messages = int(os.getenv('CONVERSATION_BATCH_MAX', '5'))
+        self._batches = {}
+        # chat_id -> the chat's latest response task; each batch waits for the one before it
+        self._responding = {}
+
+        # chat_id -> {msg_id: group name}, so a chat's replies are found without scanning others
+        self.pending_group_replies = {}
+        self.timers = TimerWheel()
 
-        if self.api_key:
-            logging.info("✅ Using Gemini API key from environment variables")
+        # Pending replies and conversation modes are written through so a restart can pick them up
+        self.state = get_reply_state_store().view(self.client.name)
+        self._restore_task = None
 
     def setup(self):
-        @self.client.on_message(filters.private & filters.command("clear") & filters.incoming)
-        async def handle_clear_command(client, message: Message):
-            chat_id = message.chat.id
-            if chat_id in self.conversation_history:
-                self.conversation_history[chat_id].clear()
-                await message.reply_text("✅ **Conversation history cleared!**\n\nনতুন কথোপকথন শুরু হবে এখন থেকে। 🔄")
-                logging.info(f"🗑️ Conversation history cleared for {message.from_user.first_name}")
-                self.emit_terminal(f'🗑️ History cleared for {message.from_user.first_name}')
-            else:
-                await message.reply_text("ℹ️ কোন conversation history নেই এই chat এ।")
+        # Restored in the background: reading the saved state waits on the store's writer thread
+        self._restore_task = asyncio.get_running_loop().create_task(self._restore_state())
 
         @self.client.on_message(filters.private & filters.command("stop") & filters.outgoing)
+        @self.instrument
         async def handle_stop_command(client, message: Message):
             """Stop all conversation modes and pending replies."""
             self.conversation_mode.clear()
+            self.state.drop_conversation()
+            self._drop_batches()
+            for chat_id in self.pending_replies:
+                self.timers.cancel(('reply', chat_id))
             self.pending_replies.clear()
+            self.state.drop_pending()
             logging.info("🛑 All conversation modes stopped")
             self.emit_terminal("🛑 Conversation modes stopped")
-            await message.edit_text("🛑 **Auto-reply Stopped**\n\nসব conversation mode বন্ধ করা হয়েছে।")
+            await self.dispatch(message.chat.id, lambda: message.edit_text(
+                "🛑 **Auto-reply Stopped**\n\nসব conversation mode বন্ধ করা হয়েছে।"))
 
         @self.client.on_message(filters.group & filters.text & filters.incoming & filters.mentioned)
+        @self.instrument
         async def handle_group_mention(client, message: Message):
             try:
                 user = message.from_user
@@ -70,76 +78,37 @@ class SmartAutoReplyModule(BaseModule):
                 logging.info(f"👥 Mentioned in group '{group_name}' by {user.first_name}")
                 self.emit_terminal(f'👥 Mentioned in {group_name} by {user.first_name}')
 
-                group_key = f"{chat_id}_{msg_id}"
-
-                if group_key in self.pending_group_replies:
+                chat_pending = self.pending_group_replies.setdefault(chat_id, {})
+                if msg_id in chat_pending:
                     return
 
                 logging.info(f"📨 New group mention from {user.first_name} - Waiting {self.group_reply_timeout}s for reply")
                 self.emit_terminal(f'⏰ Group mention: Waiting {self.group_reply_timeout}s...')
 
-                async def send_delayed_group_reply():
-                    try:
-                        logging.info(f"⏰ Waiting {self.group_reply_timeout} seconds before group auto-reply...")
-                        await asyncio.sleep(self.group_reply_timeout)
-
-                        if group_key not in self.pending_group_replies:
-                            logging.info("❌ Group reply was cancelled")
-                            return
-
-                        logging.info(f"📤 Sending auto-reply to group '{group_name}'...")
-                        self.emit_terminal(f'📤 Auto-replying in {group_name}')
-
-                        busy_message = "𝑰 𝒎𝒂𝒚𝒃𝒆 𝒃𝒖𝒔𝒚 𝒏𝒐𝒘. 💝\n\n 💬 কোন দরকার হলে ℑ𝔫𝔟𝔬𝔵 𝔪𝔢. 💝 𝑻𝒉𝒂𝒏𝒌 𝑼 💝"
-
-                        async with self._programmatic_lock:
-                            self.programmatic_message_count += 1
-
-                        try:
-                            await message.reply_text(busy_message)
-                            logging.info(f"✅ Sent busy message to group '{group_name}'")
-                            self.emit_terminal(f'✅ Replied in group: {group_name}')
-                        finally:
-                            async with self._programmatic_lock:
-                                self.programmatic_message_count -= 1
-
-                    except asyncio.CancelledError:
-                        logging.info("❌ Group auto-reply cancelled by user response")
-                        self.emit_terminal(f'❌ Group auto-reply cancelled')
-                    except Exception as e:
-                        logging.error(f"Error sending group auto-reply: {e}", exc_info=True)
-                    finally:
-                        if group_key in self.pending_group_replies:
-                            del self.pending_group_replies[group_key]
-
-                task = asyncio.create_task(send_delayed_group_reply())
-                self.pending_group_replies[group_key] = task
+                chat_pending[msg_id] = group_name
+                self.state.add_group_pending(chat_id, msg_id, time.time() + self.group_reply_timeout, group_name)
+                self.timers.schedule(('group', chat_id, msg_id), self.group_reply_timeout,
+                                     self._send_group_auto_reply, chat_id, msg_id, group_name)
 
             except Exception as e:
                 logging.error(f"Error handling group mention: {e}", exc_info=True)
 
         @self.client.on_message(filters.group & filters.outgoing)
+        @self.instrument
         async def handle_group_outgoing(client, message: Message):
             """Cancel pending group auto-replies when user manually replies in group."""
             try:
-                async with self._programmatic_lock:
-                    if self.programmatic_message_count > 0:
-                        return
+                if self.sent.is_own(message):
+                    return
 
                 chat_id = message.chat.id
-                cancelled_count = 0
-                keys_to_remove = []
-
-                for key, task in self.pending_group_replies.items():
-                    if key.startswith(f"{chat_id}_"):
-                        task.cancel()
-                        keys_to_remove.append(key)
-                        cancelled_count += 1
-
-                for key in keys_to_remove:
-                    del self.pending_group_replies[key]
+                chat_pending = self.pending_group_replies.pop(chat_id, None) or {}
 
+                for msg_id in chat_pending:
+                    self.timers.cancel(('group', chat_id, msg_id))
+                cancelled_count = len(chat_pending)
                 if cancelled_count > 0:
+                    self.state.drop_group_pending(chat_id)
                     group_name = message.chat.title or "Group"
                     logging.info(f"✅ Cancelled {cancelled_count} pending group auto-reply(s) in '{group_name}'")
                     self.emit_terminal(f'✅ Cancelled group auto-reply in {group_name}')
@@ -147,85 +116,54 @@ class SmartAutoReplyModule(BaseModule):
             except Exception as e:
                 logging.error(f"Error handling group outgoing: {e}", exc_info=True)
 
-        @self.client.on_message(filters.private & filters.text & filters.incoming)
-        async def handle_incoming_message(client, message: Message):
+        async def handle_other_command(message: Message, args: str):
+            logging.info(f"⏭️ Skipping auto-reply for command: {message.text}")
+            self.emit_terminal(f'⚙️ Command from {message.from_user.first_name}: "{message.text}"')
+
+        # Commands are dispatched by the router; only plain private text reaches this consumer
+        async def handle_incoming_message(message: Message, text: str):
             chat_id = message.chat.id
             msg_id = message.id
             user = message.from_user
 
-            if message.text.startswith('/gem'):
-                return
-
-            if message.text.startswith('/'):
-                logging.info(f"⏭️ Skipping auto-reply for command: {message.text}")
-                self.emit_terminal(f'⚙️ Command from {user.first_name}: "{message.text}"')
-                return
-
             logging.info(f'📨 Message from {user.first_name}: "{message.text[:50]}..."')
             self.emit_terminal(f'📨 Message from {user.first_name}: "{message.text[:50]}..."')
 
             if chat_id in self.conversation_mode:
-                if not self.api_key:
+                if not self.ai_enabled:
                     logging.warning(f"⚠️ Conversation mode active but GEMINI_API_KEY not set - deactivating")
                     self.emit_terminal(f'⚠️ AI unavailable for {user.first_name}')
                     del self.conversation_mode[chat_id]
+                    self.state.drop_conversation(chat_id)
 
-                    async with self._programmatic_lock:
-                        self.programmatic_message_count += 1
-                    try:
-                        await message.reply_text("⚠️ AI features are currently unavailable. GEMINI_API_KEY environment variable is not configured.\n\nPlease set the API key to enable AI responses.")
-                    finally:
-                        async with self._programmatic_lock:
-                            self.programmatic_message_count -= 1
+                    await self._reply(message, "⚠️ AI features are currently unavailable. GEMINI_API_KEY environment variable is not configured.\n\nPlease set the API key to enable AI responses.")
                     return
 
-                logging.info(f"💬 Conversation mode active for {user.first_name} - Instant AI response")
-                self.emit_terminal(f'💬 AI responding to {user.first_name}')
-
-                await client.send_chat_action(message.chat.id, ChatAction.TYPING)
-
-                try:
-                    response = await self._call_gemini_api(message.text, chat_id)
-
-                    async with self._programmatic_lock:
-                        self.programmatic_message_count += 1
-
-                    try:
-                        await message.reply_text(response)
-                        logging.info(f"✅ AI responded to {user.first_name} in conversation mode")
-                        self.emit_terminal(f'✅ AI replied to {user.first_name}')
-                    finally:
-                        async with self._programmatic_lock:
-                            self.programmatic_message_count -= 1
-
-                except Exception as e:
-                    logging.error(f"AI response error: {e}")
-
-                    async with self._programmatic_lock:
-                        self.programmatic_message_count += 1
-
-                    try:
-                        await message.reply_text("❌ দুঃখিত, AI উত্তর দিতে পারেনি। `/gem` command ব্যবহার করে চেষ্টা করুন।")
-                    finally:
-                        async with self._programmatic_lock:
-                            self.programmatic_message_count -= 1
+                self._queue_conversation_message(message)
                 return
 
             logging.info(f"📨 New message from {user.first_name} - Waiting {self.reply_timeout}s for reply")
-            self.emit_terminal(f'⏰ Waiting 120 sec for reply to {user.first_name}')
+            self.emit_terminal(f'⏰ Waiting {self.reply_timeout} sec for reply to {user.first_name}')
 
             self.pending_replies[chat_id] = {
                 'message_id': msg_id,
                 'timestamp': asyncio.get_event_loop().time()
             }
+            self.state.set_pending(chat_id, msg_id, time.time() + self.reply_timeout, user.first_name)
+
+            # Rescheduling replaces the chat's previous timer, so a burst of messages keeps one deadline
+            self.timers.schedule(('reply', chat_id), self.reply_timeout, self._send_auto_reply,
+                                 chat_id, msg_id, user.first_name)
 
-            asyncio.create_task(self._schedule_auto_reply(message, chat_id, msg_id))
+        self.on_text(handle_incoming_message)
+        self.on_unknown_command(handle_other_command)
 
         @self.client.on_message(filters.private & filters.text & filters.outgoing)
+        @self.instrument
         async def handle_outgoing_message(client, message: Message):
             chat_id = message.chat.id
 
-            if self.programmatic_message_count > 0:
+            if self.sent.is_own(message):
                 logging.info(f"🤖 Programmatic message sent - Idle timer NOT reset")
                 return
 
@@ -236,41 +174,143 @@ class SmartAutoReplyModule(BaseModule):
                 logging.info(f"✅ Cancelling auto-reply (manual reply sent)")
                 self.emit_terminal(f'✅ Auto-reply cancelled')
                 del self.pending_replies[chat_id]
+                self.state.drop_pending(chat_id)
+                self.timers.cancel(('reply', chat_id))
 
             if chat_id in self.conversation_mode:
                 logging.info(f"🔴 Manual reply - Conversation mode deactivated")
                 self.emit_terminal(f'🔴 Conversation mode OFF')
                 del self.conversation_mode[chat_id]
+                self.state.drop_conversation(chat_id)
+                self._drop_batches(chat_id)
+
+    def _queue_conversation_message(self, message: Message):
+        """Add message to its chat's batch and (re)arm the flush timer, or flush at the size limit."""
+        chat_id = message.chat.id
+        batch = self._batches.setdefault(chat_id, {'messages': [], 'handle': None})
+        batch['messages'].append(message)
+        if batch['handle'] is not None:
+            batch['handle'].cancel()
+            batch['handle'] = None
+
+        if len(batch['messages']) >= self.batch_max_messages or self.batch_window <= 0:
+            self._flush_batch(chat_id)
+        else:
+            loop = asyncio.get_running_loop()
+            batch['handle'] = loop.call_later(self.batch_window, self._flush_batch, chat_id)
+
+    def _flush_batch(self, chat_id: int):
+        batch = self._batches.pop(chat_id, None)
+        if batch and batch['messages']:
+            previous = self._responding.get(chat_id)
+            task = asyncio.get_running_loop().create_task(self._respond_after(previous, batch['messages']))
+            self._responding[chat_id] = task
+            task.add_done_callback(lambda done: self._responding.get(chat_id) is done and self._responding.pop(chat_id))
+
+    async def _respond_after(self, previous, messages):
+        """Answer a batch once the chat's previous answer is out, so its history and replies stay in order."""
+        if previous is not None:
+            await asyncio.wait([previous])
+        await self._respond_in_conversation(messages)
+
+    def _drop_batches(self, chat_id: int = None):
+        chat_ids = list(self._batches) if chat_id is None else [chat_id]
+        for key in chat_ids:
+            batch = self._batches.pop(key, None)
+            if batch and batch['handle'] is not None:
+                batch['handle'].cancel()
+
+    async def _respond_in_conversation(self, messages):
+        """Answer a batch of conversation-mode messages with one AI call and one reply."""
+        message = messages[-1]
+        chat_id = message.chat.id
+        user = message.from_user
+        query = '\n'.join(m.text for m in messages)
+
+        if chat_id not in self.conversation_mode:
+            return
+
+        if len(messages) > 1:
+            logging.info(f"📦 Batched {len(messages)} messages from {user.first_name} into one AI call")
+
+        logging.info(f"💬 Conversation mode active for {user.first_name} - Instant AI response")
+        self.emit_terminal(f'💬 AI responding to {user.first_name}')
 
-    async def _schedule_auto_reply(self, message: Message, chat_id: int, msg_id: int):
         try:
-            logging.info(f"⏰ Waiting {self.reply_timeout} seconds before auto-reply...")
-            await asyncio.sleep(self.reply_timeout)
+            await self.dispatch(chat_id, lambda: self.client.send_chat_action(chat_id, ChatAction.TYPING))
+            if self.conversation.streaming:
+                response = await self.conversation.ask_streaming(
+                    message, query, send=lambda text, call: self.dispatch(chat_id, call, text=text))
+            else:
+                response = await self.conversation.ask(chat_id, query)
+                if response is not None:
+                    await self._reply(message, response)
+            if not response:
+                await self._reply(message, "❌ দুঃখিত, AI থেকে সঠিক উত্তর পাওয়া যায়নি।")
+            logging.info(f"✅ AI responded to {user.first_name} in conversation mode")
+            self.emit_terminal(f'✅ AI replied to {user.first_name}')
+
+        except Exception as e:
+            logging.error(f"AI response error: {e}")
+            try:
+                await self._reply(message, "❌ দুঃখিত, AI উত্তর দিতে পারেনি। `/gem` command ব্যবহার করে চেষ্টা করুন।")
+            except Exception as e:
+                logging.error(f"Could not send the AI error reply to chat {chat_id}: {e}")
+
+    async def _reply(self, message: Message, text: str, priority: int = PRIORITY_INTERACTIVE):
+        """Reply through the outbound queue as one of the bot's own sends."""
+        return await self.dispatch(message.chat.id, lambda: message.reply_text(text), priority, text)
 
+    async def _send_group_auto_reply(self, chat_id: int, msg_id: int, group_name: str):
+        """Timer callback: post the busy message for a group mention nobody answered."""
+        try:
+            if msg_id not in self.pending_group_replies.get(chat_id, {}):
+                logging.info("❌ Group reply was cancelled")
+                return
+
+            logging.info(f"📤 Sending auto-reply to group '{group_name}'...")
+            self.emit_terminal(f'📤 Auto-replying in {group_name}')
+
+            busy_message = "𝑰 𝒎𝒂𝒚𝒃𝒆 𝒃𝒖𝒔𝒚 𝒏𝒐𝒘. 💝\n\n 💬 কোন দরকার হলে ℑ𝔫𝔟𝔬𝔵 𝔪𝔢. 💝 𝑻𝒉𝒂𝒏𝒌 𝑼 💝"
+
+            await self.dispatch(chat_id, lambda: self.client.send_message(chat_id, busy_message, reply_to_message_id=msg_id),
+                                PRIORITY_AWAY, busy_message)
+            logging.info(f"✅ Sent busy message to group '{group_name}'")
+            self.emit_terminal(f'✅ Replied in group: {group_name}')
+
+        except Exception as e:
+            logging.error(f"Error sending group auto-reply: {e}", exc_info=True)
+        finally:
+            chat_pending = self.pending_group_replies.get(chat_id)
+            if chat_pending is not None:
+                chat_pending.pop(msg_id, None)
+                if not chat_pending:
+                    del self.pending_group_replies[chat_id]
+            self.state.drop_group_pending(chat_id, msg_id)
+
+    async def _send_auto_reply(self, chat_id: int, msg_id: int, name: str):
+        """Timer callback: send the away message if the chat is still waiting on msg_id."""
+        try:
             if chat_id in self.pending_replies and self.pending_replies[chat_id]['message_id'] == msg_id:
                 try:
-                    logging.info(f"📤 Sending auto-reply to {message.from_user.first_name}...")
+                    logging.info(f"📤 Sending auto-reply to {name}...")
 
-                    async with self._programmatic_lock:
-                        self.programmatic_message_count += 1
+                    await self.dispatch(chat_id, lambda: self.client.send_message(chat_id, self.auto_reply_message),
+                                        PRIORITY_AWAY, self.auto_reply_message)
 
-                    try:
-                        await self.client.send_message(chat_id, self.auto_reply_message)
+                    if self.ai_enabled:
+                        self.conversation_mode[chat_id] = True
+                        self.state.set_conversation(chat_id)
+                        logging.info(f'✅ Auto-reply sent + Conversation mode ACTIVATED for {name}')
+                        self.emit_terminal(f'🤖 Auto-replied + 💬 Conversation mode ON for {name}')
+                    else:
+                        logging.info(f'✅ Auto-reply sent (AI disabled - no GEMINI_API_KEY) for {name}')
+                        self.emit_terminal(f'🤖 Auto-replied to {name} (AI disabled)')
 
-                        if self.api_key:
-                            self.conversation_mode[chat_id] = True
-                            logging.info(f'✅ Auto-reply sent + Conversation mode ACTIVATED for {message.from_user.first_name}')
-                            self.emit_terminal(f'🤖 Auto-replied + 💬 Conversation mode ON for {message.from_user.first_name}')
-                        else:
-                            logging.info(f'✅ Auto-reply sent (AI disabled - no GEMINI_API_KEY) for {message.from_user.first_name}')
-                            self.emit_terminal(f'🤖 Auto-replied to {message.from_user.first_name} (AI disabled)')
+                    self.away_message_used = True
 
-                        self.away_message_used = True
-
-                        del self.pending_replies[chat_id]
-                    finally:
-                        async with self._programmatic_lock:
-                            self.programmatic_message_count -= 1
+                    del self.pending_replies[chat_id]
+                    self.state.drop_pending(chat_id)
 
                 except Exception as e:
                     logging.error(f"❌ Failed to send auto-reply: {e}", exc_info=True)
@@ -279,87 +319,58 @@ class SmartAutoReplyModule(BaseModule):
         except Exception as e:
             logging.error(f"Error in auto-reply scheduling: {e}", exc_info=True)
 
-    async def _call_gemini_api(self, query: str, chat_id: int) -> str:
-        import requests
-
-        if not self.api_url:
-            logging.error("❌ Cannot call Gemini API: GEMINI_API_KEY not configured")
-            raise Exception("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
-
-        if chat_id not in self.conversation_history:
-            self.conversation_history[chat_id] = deque(maxlen=self.max_history_length)
-
-            system_prompt = {
-                "role": "user",
-                "parts": [{
-                    "text": "You are a helpful AI assistant of Mahit Labib. Language guidelines:\n"
-                            "- If the user writes in Bengali (বাংলা) or uses English letters to write Bengali (Banglish/Roman Bengali), respond in Bengali (বাংলা script)\n"
-                            "- If the user writes in English, respond in English\n"
-                            "- If the user writes in any other language, respond in English\n"
-                            "- Be natural, friendly, and helpful in your responses"
-                }]
-            }
-            model_ack = {
-                "role": "model",
-                "parts": [{"text": "আমি বুঝেছি! আমি বাংলা বা ইংরেজিতে সাহায্য করতে পারি। কিভাবে সাহায্য করতে পারি?"}]
-            }
-            self.conversation_history[chat_id].append(system_prompt)
-            self.conversation_history[chat_id].append(model_ack)
-
-        user_message = {
-            "role": "user",
-            "parts": [{"text": query}]
-        }
-        self.conversation_history[chat_id].append(user_message)
-
-        payload = {
-            "contents": list(self.conversation_history[chat_id]),
-            "generationConfig": {
-                "temperature": 0.7,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 2048,
-            }
-        }
-
-        headers = {
-            "Content-Type": "application/json"
-        }
-
+    async def _restore_state(self):
+        """Re-arm timers and conversation modes saved by a previous run, from their absolute deadlines."""
+        started = time.monotonic()
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-
-            response.raise_for_status()
-            data = response.json()
-
-            if 'candidates' in data and len(data['candidates']) > 0:
-                candidate = data['candidates'][0]
-                if 'content' in candidate and 'parts' in candidate['content']:
-                    parts = candidate['content']['parts']
-                    if len(parts) > 0 and 'text' in parts[0]:
-                        ai_response = parts[0]['text']
-
-                        model_message = {
-                            "role": "model",
-                            "parts": [{"text": ai_response}]
-                        }
-                        self.conversation_history[chat_id].append(model_message)
-
-                        return ai_response
-
-            return "❌ দুঃখিত, AI থেকে সঠিক উত্তর পাওয়া যায়নি।"
-
+            pending, group_pending, conversations = await self.state.load()
         except Exception as e:
-            logging.error(f"Gemini API error: {e}", exc_info=True)
-            raise
+            logging.error(f"Could not restore saved auto-reply state: {e}", exc_info=True)
+            return
+        now = time.time()
+        loop_now = asyncio.get_event_loop().time()
+
+        for chat_id in conversations:
+            self.conversation_mode[chat_id] = True
+
+        for chat_id, msg_id, deadline, name in pending:
+            if deadline < now - STALE_REPLY_AGE:
+                self.state.drop_pending(chat_id)
+                continue
+            self.pending_replies[chat_id] = {'message_id': msg_id, 'timestamp': loop_now}
+            self.timers.schedule(('reply', chat_id), max(0.0, deadline - now), self._send_auto_reply,
+                                 chat_id, msg_id, name)
+
+        for chat_id, msg_id, deadline, name in group_pending:
+            if deadline < now - STALE_REPLY_AGE:
+                self.state.drop_group_pending(chat_id, msg_id)
+                continue
+            self.pending_group_replies.setdefault(chat_id, {})[msg_id] = name
+            self.timers.schedule(('group', chat_id, msg_id), max(0.0, deadline - now),
+                                 self._send_group_auto_reply, chat_id, msg_id, name)
+
+        if len(self.timers) or conversations:
+            logging.info(f"♻️ Restored {len(self.pending_replies)} pending replies, "
+                         f"{sum(map(len, self.pending_group_replies.values()))} group replies and "
+                         f"{len(conversations)} conversation modes in {time.monotonic() - started:.3f}s")
+
+    def metrics(self) -> dict:
+        return {
+            "pending_timers": len(self.timers),
+            "pending_replies": len(self.pending_replies),
+            "pending_group_replies": sum(map(len, self.pending_group_replies.values())),
+            "conversation_modes": len(self.conversation_mode),
+            "conversation_batches": len(self._batches),
+        }
 
     def cleanup(self):
+        if self._restore_task is not None:
+            self._restore_task.cancel()
         self.pending_replies.clear()
         self.conversation_mode.clear()
-        self.conversation_history.clear()
+        self.pending_group_replies.clear()
+        self._drop_batches()
+        for task in list(self._responding.values()):
+            task.cancel()
+        self.timers.clear()
         logging.info("Smart Auto-Reply module cleaned up")
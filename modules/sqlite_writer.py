@@ -0,0 +1,97 @@
+import time
+import queue
+import logging
+import sqlite3
+import threading
+
+
+class BatchedWriter:
+    """
+    One SQLite connection (WAL mode) whose writes never block the caller.
+
+    submit() only queues a statement; a background thread groups
+    everything arriving within ``flush_interval`` into a single
+    transaction. Reads go through read(), which is blocking and meant to
+    be run in an executor when called from the event loop.
+    """
+
+    def __init__(self, path: str, schema=(), flush_interval: float = 0.2, max_batch: int = 1000,
+                 name: str = 'sqlite-writer'):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        for statement in schema:
+            self._db.execute(statement)
+        self._db.commit()
+        self._db_lock = threading.Lock()
+
+        self._ops = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name=name, daemon=True)
+        self._writer.start()
+
+    def submit(self, sql: str, params: tuple):
+        self._ops.put((sql, params))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until every write queued so far is committed."""
+        done = threading.Event()
+        self._ops.put(done)
+        done.wait(timeout)
+
+    def read(self, sql: str, params: tuple = (), flush: bool = True) -> list:
+        """Run a query (after committing queued writes, unless flush is False) and return all rows."""
+        if flush:
+            self.flush()
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def close(self):
+        self._ops.put(None)
+        self._writer.join(timeout=5)
+        with self._db_lock:
+            self._db.close()
+
+    def _write_loop(self):
+        while True:
+            op = self._ops.get()
+            if op is None:
+                return
+            batch = [op]
+            deadline = time.monotonic() + self.flush_interval
+            # Someone is waiting on a flush: commit what we have instead of waiting out the window
+            while len(batch) < self.max_batch and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._ops.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._apply(batch)
+                    return
+                batch.append(op)
+            self._apply(batch)
+
+    def _apply(self, batch):
+        waiters = [op for op in batch if isinstance(op, threading.Event)]
+        writes = [op for op in batch if not isinstance(op, threading.Event)]
+        if writes:
+            try:
+                with self._db_lock:
+                    with self._db:
+                        for sql, params in writes:
+                            self._db.execute(sql, params)
+                self.commits += 1
+                self.writes += len(writes)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to persist {len(writes)} change(s) to {self.path}: {e}")
+        for waiter in waiters:
+            waiter.set()
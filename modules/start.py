@@ -1,12 +1,11 @@
 import logging
-from pyrogram import filters
 from pyrogram.types import Message
 from .base_module import BaseModule
 
 
 class StartCommandModule(BaseModule):
-    def __init__(self, client, socketio):
-        super().__init__(client, socketio)
+    def __init__(self, client, socketio, conversation=None, outbound=None, router=None, sent=None):
+        super().__init__(client, socketio, conversation, outbound, router, sent)
         self.welcome_message = (
             "👋 **স্বাগতম!**\n\n"
             "আমি একটি স্মার্ট Telegram Bot। আমার সাথে চ্যাট করুন!\n\n"
@@ -20,18 +19,15 @@ class StartCommandModule(BaseModule):
         )
     
     def setup(self):
-        start_filter = filters.private & filters.incoming & filters.regex(r"^/start\b")
-        
-        @self.client.on_message(start_filter)
-        async def handle_start_command(client, message: Message):
+        async def handle_start_command(message: Message, args: str):
             logging.info(f"▶️ /start command from {message.from_user.first_name} (ID: {message.from_user.id})")
             self.emit_terminal(f'▶️ /start command from {message.from_user.first_name}')
             
             try:
-                await message.reply_text(
+                await self.dispatch(message.chat.id, lambda: message.reply_text(
                     self.welcome_message,
                     disable_web_page_preview=True
-                )
+                ), text=self.welcome_message)
                 
                 logging.info(f"✅ Welcome message sent to {message.from_user.first_name}")
                 self.emit_terminal(f'✅ Welcome message sent to {message.from_user.first_name}')
@@ -39,6 +35,8 @@ class StartCommandModule(BaseModule):
             except Exception as e:
                 logging.error(f"Error sending welcome message: {e}", exc_info=True)
                 self.emit_terminal(f'❌ Error sending welcome message: {str(e)}')
+        
+        self.on_command("start", handle_start_command)
     
     def cleanup(self):
         """Cleanup resources."""
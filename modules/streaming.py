@@ -0,0 +1,91 @@
+import os
+import asyncio
+import logging
+from pyrogram.errors import FloodWait, MessageNotModified
+from pyrogram.types import Message
+
+
+TELEGRAM_TEXT_LIMIT = 4096
+
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))
+STREAM_EDIT_MIN_CHARS = int(os.getenv('STREAM_EDIT_MIN_CHARS', '40'))
+
+
+def streaming_enabled() -> bool:
+    return os.getenv('GEMINI_STREAMING', '').lower() in ('1', 'true', 'yes')
+
+
+async def stream_reply(message: Message, chunks, interval: float = STREAM_EDIT_INTERVAL,
+                       min_chars: int = STREAM_EDIT_MIN_CHARS, send=None) -> str:
+    """
+    Reply to message with text arriving from the async iterator chunks.
+
+    The first chunk is sent immediately; later chunks are applied by
+    editing that reply at most once per interval, and only after at least
+    min_chars new characters, which keeps well inside Telegram's edit rate
+    limits. Text beyond one message's limit continues in a new reply.
+    New replies go through send(text, call) when given, so the caller can
+    queue and mark them (OutboundDispatcher, SentMessages). chunks is
+    closed however the reply ends. Returns the full text received.
+    """
+    loop = asyncio.get_running_loop()
+    full_text = ''
+    offset = 0
+    sent = None
+    shown = ''
+    next_edit = 0.0
+
+    async def reply(text):
+        if send is None:
+            return await message.reply_text(text)
+        return await send(text, lambda: message.reply_text(text))
+
+    async def show(text):
+        nonlocal sent, shown, next_edit
+        try:
+            if sent is None:
+                sent = await reply(text)
+            else:
+                await sent.edit_text(text)
+            shown = text
+            next_edit = loop.time() + interval
+        except MessageNotModified:
+            shown = text
+        except FloodWait as e:
+            logging.warning(f"⏳ FloodWait while streaming reply - pausing edits for {e.value}s")
+            next_edit = loop.time() + e.value
+
+    async def settle(text):
+        # Text that ends a message must land, so wait out the throttle (or a FloodWait) instead of skipping it
+        for _ in range(3):
+            if not text.strip() or text == shown:
+                return
+            if sent is not None:
+                wait = next_edit - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            await show(text)
+
+    try:
+        async for chunk in chunks:
+            full_text += chunk
+            current = full_text[offset:]
+
+            while len(current) > TELEGRAM_TEXT_LIMIT:
+                await settle(current[:TELEGRAM_TEXT_LIMIT])
+                offset += TELEGRAM_TEXT_LIMIT
+                current = full_text[offset:]
+                sent, shown = None, ''
+
+            if not current.strip():
+                continue
+            if sent is None or (loop.time() >= next_edit and len(current) - len(shown) >= min_chars):
+                await show(current)
+    finally:
+        # Stop the producer (e.g. an HTTP stream) even when a send failed midway
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+    await settle(full_text[offset:])
+    return full_text
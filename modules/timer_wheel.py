@@ -0,0 +1,89 @@
+import math
+import asyncio
+import logging
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel for keyed, coarse-grained deadlines.
+
+    Every timer lives in a slot dict of a fixed-size wheel, so schedule,
+    reschedule and cancel are O(1) dict operations. A single driver task
+    advances the wheel once per tick and only spawns a task for timers
+    that actually fire; it exits while the wheel is empty.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots = slots
+        self._wheel = [{} for _ in range(slots)]
+        self._slot_of = {}
+        self._origin = None
+        self._processed_tick = 0
+        self._task = None
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def _current_tick(self, loop) -> int:
+        if self._origin is None:
+            self._origin = loop.time()
+        return int((loop.time() - self._origin) / self.tick)
+
+    def schedule(self, key, delay: float, callback, *args):
+        """Run ``await callback(*args)`` after ``delay`` seconds, replacing any timer already set for key."""
+        loop = asyncio.get_running_loop()
+        self.cancel(key)
+
+        if self._task is None or self._task.done():
+            self._processed_tick = self._current_tick(loop)
+            self._task = loop.create_task(self._run())
+
+        expires = self._current_tick(loop) + max(1, math.ceil(delay / self.tick))
+        slot = expires % self.slots
+        self._wheel[slot][key] = (expires, callback, args)
+        self._slot_of[key] = slot
+
+    def cancel(self, key) -> bool:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._wheel[slot][key]
+        return True
+
+    def clear(self):
+        for bucket in self._wheel:
+            bucket.clear()
+        self._slot_of.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._slot_of:
+            next_tick = self._processed_tick + 1
+            await asyncio.sleep(max(0.0, self._origin + next_tick * self.tick - loop.time()))
+
+            now_tick = self._current_tick(loop)
+            while self._processed_tick < now_tick:
+                self._processed_tick += 1
+                self._expire(self._processed_tick, loop)
+
+    def _expire(self, tick: int, loop):
+        bucket = self._wheel[tick % self.slots]
+        due = [key for key, (expires, _, _) in bucket.items() if expires <= tick]
+        for key in due:
+            _, callback, args = bucket.pop(key)
+            del self._slot_of[key]
+            loop.create_task(self._fire(key, callback, args))
+
+    @staticmethod
+    async def _fire(key, callback, args):
+        try:
+            await callback(*args)
+        except Exception as e:
+            logging.error(f"Timer {key!r} callback failed: {e}", exc_info=True)
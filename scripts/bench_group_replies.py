@@ -0,0 +1,133 @@
+"""
+Benchmark cancelling one group's pending auto-replies while many other
+groups have mentions waiting.
+
+SmartAutoReplyModule's own handlers are driven through a fake client:
+mentions are spread over --groups groups, then a manual reply in one
+group is timed. The old layout (one flat dict keyed "chat_msg", scanned
+with startswith) is timed on the same data for comparison.
+
+    python scripts/bench_group_replies.py [--mentions 10000] [--groups 1000]
+
+Exits non-zero if the per-chat index does not stay flat as the total grows.
+"""
+import gc
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import tempfile
+from types import SimpleNamespace
+
+from checks import check
+
+# The module opens the shared state store on construction; keep it out of session/
+os.environ['REPLY_STATE_DB'] = os.path.join(tempfile.mkdtemp(prefix='bench-group-'), 'reply_state.db')
+
+from modules.smart_auto_reply import SmartAutoReplyModule
+
+
+class FakeClient:
+    """Collects the handlers a module registers; nothing is ever sent."""
+
+    name = 'bench'
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on_message(self, _filters=None, group=0):
+        def register(handler):
+            self.handlers[handler.__name__] = handler
+            return handler
+        return register
+
+
+class DiscardedState:
+    """Stands in for the bot's ReplyState: its SQLite writes happen off the loop and are not what is measured."""
+
+    async def load(self):
+        return [], [], []
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+class Silent:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+def message(chat_id, msg_id, text='@me'):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id, title=f"group {chat_id}"), id=msg_id, text=text,
+                           caption=None, from_user=SimpleNamespace(first_name='someone'))
+
+
+def prefix_scan_cancel(pending: dict, chat_id) -> int:
+    """The previous handle_group_outgoing: scan every pending key for the chat's prefix."""
+    keys = [key for key in pending if key.startswith(f"{chat_id}_")]
+    for key in keys:
+        del pending[key]
+    return len(keys)
+
+
+async def measure(mentions: int, groups: int, rounds: int):
+    client = FakeClient()
+    module = SmartAutoReplyModule(client, Silent(), SimpleNamespace(enabled=False), router=SimpleNamespace(
+        command=lambda *a: None, set_text_consumer=lambda *a: None, set_fallback=lambda *a: None))
+    module.state = DiscardedState()
+    module.setup()
+    mention = client.handlers['handle_group_mention']
+    outgoing = client.handlers['handle_group_outgoing']
+
+    for n in range(mentions):
+        await mention(client, message(-(n % groups) - 1, n))
+    flat = {f"{-(n % groups) - 1}_{n}": f"group {n % groups}" for n in range(mentions)}
+
+    # Each round cancels a different group that still has its mentions pending. The layouts are
+    # timed in separate passes so the big scans do not evict the index from the CPU cache.
+    chat_ids = [-r - 1 for r in range(min(rounds, groups))]
+    indexed, scanned = [], []
+    # Like timeit: a collection landing in one round would swamp microsecond timings
+    gc.collect()
+    gc.disable()
+    for r, chat_id in enumerate(chat_ids):
+        started = time.perf_counter()
+        await outgoing(client, message(chat_id, 10 ** 9 + r, 'manual reply'))
+        indexed.append(time.perf_counter() - started)
+    for chat_id in chat_ids:
+        started = time.perf_counter()
+        prefix_scan_cancel(flat, chat_id)
+        scanned.append(time.perf_counter() - started)
+    gc.enable()
+    remaining = sum(map(len, module.pending_group_replies.values()))
+    module.cleanup()
+    return statistics.median(indexed), statistics.median(scanned), remaining, len(flat)
+
+
+async def main(args):
+    results = []
+    for scale in (10, 1):
+        mentions, groups = args.mentions // scale, max(1, args.groups // scale)
+        indexed, scanned, remaining, flat_remaining = await measure(mentions, groups, args.rounds)
+        print(f"{mentions:>7} mentions / {groups:>5} groups: per-chat index {indexed * 1e6:8.1f}us, "
+              f"prefix scan {scanned * 1e6:8.1f}us per cancelled group (median)")
+        results.append((indexed, scanned))
+        if remaining != flat_remaining:
+            print(f"FAIL layouts disagree: {remaining} vs {flat_remaining} mentions left")
+            return False
+
+    (small_indexed, small_scanned), (large_indexed, large_scanned) = results
+    print(f"10x the mentions: per-chat index x{large_indexed / small_indexed:.1f}, "
+          f"prefix scan x{large_scanned / small_scanned:.1f}")
+    # Same mentions per group at both scales, so the indexed cost should not follow the total
+    return check(large_indexed < small_indexed * 3, "cancelling one group stays flat as pending mentions grow")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mentions', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=200, help='groups cancelled per measurement')
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
@@ -0,0 +1,74 @@
+"""
+Drive ConversationStore with a small MemoryBudget and a spill database in
+a temporary directory, and check that idle and over-budget chats are
+evicted, including the last one resident, and come back from disk intact.
+
+    python scripts/check_conversation_store.py
+
+Exits non-zero if any check fails.
+"""
+import os
+import sys
+import asyncio
+import tempfile
+
+from checks import check, run_scenarios
+from modules.conversation_store import ConversationStore, MemoryBudget, SCHEMA, turn_size
+from modules.sqlite_writer import BatchedWriter
+
+
+def turn(text):
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+async def lone_idle_chat(spill):
+    """The sweeper spills a chat that went idle even when no other chat is resident."""
+    budget = MemoryBudget(idle_ttl=0.05, sweep_interval=0.05)
+    store = ConversationStore('idle', budget=budget, spill=spill)
+    await store.append(1, turn('hello'))
+    resident = budget.stats()["resident_chats"]
+    await asyncio.sleep(0.3)
+    stats = budget.stats()
+    history = await store.get(1)
+    store.close()
+    return all([
+        check(resident == 1, "the chat is resident right after the append"),
+        check(stats["resident_chats"] == 0 and stats["resident_bytes"] == 0,
+              f"the idle chat is evicted by the sweeper ({stats})"),
+        check(store.evictions >= 1 and store.reloads == 1, "it was spilled and reloaded from disk"),
+        check(history is not None and list(history) == [turn('hello')], "its history comes back intact"),
+    ])
+
+
+async def lone_chat_over_budget(spill):
+    """A single chat that outgrows the byte budget on its own is spilled, and later appends still land."""
+    first, second = turn('x' * 200), turn('y' * 200)
+    budget = MemoryBudget(max_bytes=turn_size(first) + 10, sweep_interval=3600)
+    store = ConversationStore('large', budget=budget, spill=spill)
+    await store.append(1, first)
+    kept = budget.stats()["resident_chats"]
+    await store.append(1, second)
+    stats = budget.stats()
+    spilled = store.stats().get("spilled_chats")
+    history = await store.get(1)
+    store.close()
+    return all([
+        check(kept == 1, "a chat within the budget stays resident"),
+        check(stats["resident_chats"] == 0 and stats["resident_bytes"] == 0,
+              f"the chat is evicted once it alone is over budget ({stats})"),
+        check(spilled == 1, "it is spilled rather than dropped"),
+        check(history is not None and list(history) == [first, second], "both turns come back from disk"),
+    ])
+
+
+async def main():
+    with tempfile.TemporaryDirectory(prefix='conversation-store-') as tmp:
+        spill = BatchedWriter(os.path.join(tmp, 'spill.db'), SCHEMA, name='conversation-spill')
+        try:
+            return await run_scenarios((lone_idle_chat, lone_chat_over_budget), spill)
+        finally:
+            spill.close()
+
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(main()) else 1)
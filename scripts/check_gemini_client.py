@@ -0,0 +1,136 @@
+"""
+Run GeminiClient against the local stub (scripts/gemini_stub.py) and check
+its request/response handling, SSE parsing, error propagation and
+throughput with many concurrent chats.
+
+    python scripts/check_gemini_client.py [--chats 64] [--latency 0.2]
+
+Exits non-zero if any check fails.
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+from checks import check, run_scenarios
+from modules.gemini_client import GeminiClient
+from gemini_stub import start_stub, payload
+
+
+async def generate(api_base):
+    """generate() returns the decoded response for dict and pre-encoded payloads."""
+    client = GeminiClient('test', api_base=api_base)
+    data = await client.generate(payload('hello'))
+    encoded = await client.generate(b'{"contents": [{"parts": [{"text": "bytes"}]}]}')
+    client.close()
+    return all([
+        check(client.extract_text(data) == 'hello', "dict payload round-trips"),
+        check(client.extract_text(encoded) == 'bytes', "pre-encoded payload round-trips"),
+    ])
+
+
+async def stream(api_base):
+    """stream() yields every data: event's text in order and skips comments and text-less events."""
+    client = GeminiClient('test', api_base=api_base)
+    text = 'Streaming ответ with some unicode ✓ ' * 10
+    chunks = [chunk async for chunk in client.stream(payload(text))]
+    client.close()
+    return all([
+        check(len(chunks) == 8, f"one chunk per SSE text event ({len(chunks)})"),
+        check(''.join(chunks) == text, "chunks reassemble to the full reply"),
+    ])
+
+
+async def stream_abandoned(_api_base):
+    """Leaving a stream early frees its pool thread at the next event instead of reading the whole response."""
+    server, api_base = start_stub(chunks=8, chunk_delay=1.0)
+    client = GeminiClient('test', api_base=api_base, max_concurrency=1)
+    gen = client.stream(payload('x' * 80))
+    first = await gen.__anext__()
+    await gen.aclose()
+    started = time.monotonic()
+    data = await asyncio.wait_for(client.generate(payload('next')), timeout=5)
+    elapsed = time.monotonic() - started
+    client.close()
+    server.shutdown()
+    return all([
+        check(first == 'x' * 10, "first chunk arrives"),
+        check(client.extract_text(data) == 'next' and elapsed < 2.5,
+              f"the single pool thread is free again long before the 8s stream ends ({elapsed:.2f}s)"),
+    ])
+
+
+async def errors(api_base):
+    """HTTP errors (for generate() and stream()) and a missing API key surface to the caller."""
+    client = GeminiClient('test', model='fail', api_base=api_base)
+    raised = []
+    try:
+        await client.generate(payload('x'))
+    except Exception as e:
+        raised.append(e)
+    try:
+        async for _ in client.stream(payload('x')):
+            pass
+    except Exception as e:
+        raised.append(e)
+    client.close()
+    unconfigured = GeminiClient('')
+    try:
+        await unconfigured.generate(payload('x'))
+        missing_key = False
+    except Exception:
+        missing_key = True
+    unconfigured.close()
+    return all([
+        check(len(raised) == 2 and all('500' in str(e) for e in raised), f"HTTP 500 is raised ({raised})"),
+        check(missing_key, "a missing API key is reported before any request"),
+    ])
+
+
+async def throughput(api_base, chats, latency, max_concurrency):
+    """N chats asking at once finish in ~ceil(N / max_concurrency) * latency while the loop stays responsive."""
+    client = GeminiClient('test', api_base=api_base, max_concurrency=max_concurrency)
+    loop = asyncio.get_running_loop()
+    lag = 0.0
+
+    async def ticker():
+        nonlocal lag
+        while True:
+            expected = loop.time() + 0.01
+            await asyncio.sleep(0.01)
+            lag = max(lag, loop.time() - expected)
+
+    watcher = asyncio.ensure_future(ticker())
+    started = time.monotonic()
+    replies = await asyncio.gather(*(client.generate(payload(f"chat {n}")) for n in range(chats)))
+    elapsed = time.monotonic() - started
+    watcher.cancel()
+    client.close()
+    ideal = -(-chats // max_concurrency) * latency
+    print(f"     {chats} chats, {max_concurrency} concurrent: {elapsed:.2f}s ({chats / elapsed:.0f} req/s), "
+          f"worst loop lag {lag * 1000:.1f}ms")
+    return all([
+        check([client.extract_text(r) for r in replies] == [f"chat {n}" for n in range(chats)],
+              "every chat gets its own answer"),
+        check(elapsed < ideal + 1.0, f"calls overlap up to the concurrency cap ({elapsed:.2f}s, ideal {ideal:.2f}s)"),
+        check(lag < 0.1, f"the event loop is never blocked ({lag * 1000:.1f}ms)"),
+    ])
+
+
+async def main(args):
+    server, api_base = start_stub(chunks=8, chunk_delay=0.01)
+    slow_server, slow_api_base = start_stub(latency=args.latency)
+    results = [await run_scenarios((generate, stream, stream_abandoned, errors), api_base)]
+    print("# throughput")
+    results.append(await throughput(slow_api_base, args.chats, args.latency, args.max_concurrency))
+    server.shutdown()
+    slow_server.shutdown()
+    return all(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=64, help='concurrent chats in the throughput run')
+    parser.add_argument('--latency', type=float, default=0.2, help='stub latency per request in seconds')
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
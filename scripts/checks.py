@@ -0,0 +1,20 @@
+"""Shared helpers for the check and simulation scripts in this directory."""
+import os
+import sys
+
+# Scripts are run directly, so make the repository's modules package importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def check(condition, description):
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    return bool(condition)
+
+
+async def run_scenarios(scenarios, *args):
+    """Await each scenario(*args) under a heading; True only if all of them passed."""
+    results = []
+    for scenario in scenarios:
+        print(f"# {scenario.__name__}")
+        results.append(await scenario(*args))
+    return all(results)
@@ -0,0 +1,132 @@
+"""
+Local stand-in for the Gemini generateContent / streamGenerateContent API.
+
+Every request is answered with the text of the last part of its last
+content, so callers control exactly what comes back. Streaming replies
+are split into --chunks SSE events spaced --chunk-delay seconds apart,
+with a comment line and a text-less final event mixed in as the real API
+does. Requests for the model named "fail" get HTTP 500.
+
+    python scripts/gemini_stub.py --port 8765 --latency 0.2
+    GEMINI_API_BASE=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=test python main.py
+
+Other scripts start it in-process with start_stub().
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not parse_qs(url.query).get('key'):
+            return self._send_json(403, {"error": {"code": 403, "message": "API key missing"}})
+        model, _, method = url.path.rpartition('/models/')[2].partition(':')
+        if model == 'fail':
+            return self._send_json(500, {"error": {"code": 500, "message": "stub failure"}})
+
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        text = echo_text(payload)
+        if method == 'generateContent':
+            return self._send_json(200, candidate(text, finished=True))
+        if method == 'streamGenerateContent':
+            return self._send_stream(text)
+        self._send_json(404, {"error": {"code": 404, "message": f"unknown method {method}"}})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            self._write_chunk(b': stub stream\r\n\r\n')
+            size = max(1, -(-len(text) // self.server.chunks))
+            for start in range(0, len(text), size):
+                event = json.dumps(candidate(text[start:start + size]), ensure_ascii=False)
+                self._write_chunk(f"data: {event}\r\n\r\n".encode('utf-8'))
+                time.sleep(self.server.chunk_delay)
+            event = json.dumps({"candidates": [{"finishReason": "STOP"}], "usageMetadata": {"totalTokenCount": 0}})
+            self._write_chunk(f"data: {event}\r\n\r\n".encode('utf-8'))
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading mid-stream
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def echo_text(payload: dict) -> str:
+    contents = payload.get('contents') or [{}]
+    parts = contents[-1].get('parts') or [{}]
+    return parts[-1].get('text', '')
+
+
+def payload(text: str) -> dict:
+    """A one-turn generateContent request; the stub answers it with text."""
+    return {"contents": [{"role": "user", "parts": [{"text": text}]}]}
+
+
+def candidate(text: str, finished: bool = False) -> dict:
+    data = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if finished:
+        data["finishReason"] = "STOP"
+    return {"candidates": [data]}
+
+
+def make_server(host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, chunks: int = 8,
+                chunk_delay: float = 0.05, verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.chunks = max(1, chunks)
+    server.chunk_delay = chunk_delay
+    server.verbose = verbose
+    server.requests = 0
+    return server
+
+
+def start_stub(**options):
+    """Serve a stub on a free local port from a daemon thread; returns (server, api_base)."""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, name='gemini-stub', daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1beta"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each reply starts')
+    parser.add_argument('--chunks', type=int, default=8, help='SSE events per streamed reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.05, help='seconds between SSE events')
+    args = parser.parse_args()
+    stub = make_server(args.host, args.port, args.latency, args.chunks, args.chunk_delay, verbose=True)
+    print(f"Gemini stub on http://{args.host}:{args.port}/v1beta")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,116 @@
+"""
+Drive OutboundDispatcher against a fake Telegram client and check its
+pacing, priority order and FloodWait handling.
+
+    python scripts/simulate_outbound.py
+
+Exits non-zero if any check fails.
+"""
+import sys
+import asyncio
+
+from checks import check, run_scenarios
+from pyrogram.errors import FloodWait
+from modules.outbound import OutboundDispatcher, PRIORITY_INTERACTIVE, PRIORITY_AWAY
+
+
+class FakeClient:
+    """Records when each send reached 'Telegram'; can be told to answer the next sends with FloodWait."""
+
+    def __init__(self):
+        self.sent = []
+        self.flood_waits = []
+
+    async def send_message(self, chat_id, text):
+        loop = asyncio.get_running_loop()
+        if self.flood_waits:
+            raise FloodWait(value=self.flood_waits.pop(0))
+        self.sent.append((loop.time(), chat_id, text))
+        return text
+
+
+async def pacing():
+    """A chat gets its burst at once, then one send per 1/chat_rate seconds."""
+    client = FakeClient()
+    outbound = OutboundDispatcher(chat_rate=20, chat_burst=2, account_rate=1000, account_burst=1000)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.gather(*(outbound.send(1, lambda i=i: client.send_message(1, i)) for i in range(10)))
+    outbound.close()
+    times = [at - started for at, _, _ in client.sent]
+    gaps = [later - earlier for earlier, later in zip(times[2:], times[3:])]
+    return all([
+        check([text for _, _, text in client.sent] == list(range(10)), "one chat's sends keep their order"),
+        check(times[1] < 0.02, f"burst of 2 goes out immediately ({times[1]:.3f}s)"),
+        check(times[-1] >= (10 - 2) / 20 - 0.01, f"10 sends at 20/s after a burst of 2 take >= 0.4s ({times[-1]:.3f}s)"),
+        check(min(gaps) >= 0.04, f"sends after the burst are spaced ~50ms apart (min {min(gaps) * 1000:.0f}ms)"),
+    ])
+
+
+async def priority():
+    """With the account budget exhausted, interactive sends overtake queued away messages."""
+    client = FakeClient()
+    outbound = OutboundDispatcher(chat_rate=1000, chat_burst=1000, account_rate=20, account_burst=1)
+    away = [asyncio.ensure_future(outbound.send(chat, lambda chat=chat: client.send_message(chat, 'away'), PRIORITY_AWAY))
+            for chat in range(5)]
+    await asyncio.sleep(0.01)
+    interactive = [asyncio.ensure_future(outbound.send(chat, lambda chat=chat: client.send_message(chat, 'reply'),
+                                                       PRIORITY_INTERACTIVE))
+                   for chat in range(100, 105)]
+    await asyncio.gather(*away, *interactive)
+    outbound.close()
+    order = [text for _, _, text in client.sent]
+    # The first away send takes the only token before anything interactive is queued
+    return all([
+        check(order[:1] == ['away'], "first away send uses the initial token"),
+        check(order[1:6] == ['reply'] * 5, f"interactive sends are served next ({order})"),
+        check(order[6:] == ['away'] * 4, "remaining away sends follow"),
+    ])
+
+
+async def flood_wait():
+    """A FloodWait pauses the whole account for its duration, then the send is retried."""
+    client = FakeClient()
+    # Telegram (and pyrogram's FloodWait) only deal in whole seconds
+    client.flood_waits = [1]
+    outbound = OutboundDispatcher(chat_rate=1000, chat_burst=1000, account_rate=1000, account_burst=1000)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first = asyncio.ensure_future(outbound.send(1, lambda: client.send_message(1, 'first')))
+    await asyncio.sleep(0.05)
+    second = await outbound.send(2, lambda: client.send_message(2, 'second'))
+    await first
+    outbound.close()
+    times = {text: at - started for at, _, text in client.sent}
+    stats = outbound.stats()
+    return all([
+        check(second == 'second', "other chats' sends still complete"),
+        check(times['first'] >= 1, f"flooded send is retried after the wait ({times['first']:.3f}s)"),
+        check(times['second'] >= 1, f"other chats wait out the pause too ({times['second']:.3f}s)"),
+        check(stats['flood_waits'] == 1 and stats['sent'] == 2 and stats['failed'] == 0, f"counters {stats}"),
+    ])
+
+
+async def flood_wait_too_long():
+    """A FloodWait longer than max_flood_wait is raised to the caller instead of retried."""
+    client = FakeClient()
+    client.flood_waits = [600]
+    outbound = OutboundDispatcher(max_flood_wait=300)
+    try:
+        await outbound.send(1, lambda: client.send_message(1, 'x'))
+        raised = False
+    except FloodWait:
+        raised = True
+    outbound.close()
+    return all([
+        check(raised, "FloodWait above max_flood_wait is raised"),
+        check(outbound.stats()['failed'] == 1, "and counted as failed"),
+    ])
+
+
+async def main():
+    return await run_scenarios((pacing, priority, flood_wait, flood_wait_too_long))
+
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,144 @@
+"""
+Stream replies from the local Gemini stub (scripts/gemini_stub.py) into a
+fake Telegram message with stream_reply() and check time to first text,
+edit throttling, FloodWait handling, long-reply splitting and cleanup.
+
+    python scripts/simulate_streaming.py
+
+Exits non-zero if any check fails.
+"""
+import sys
+import asyncio
+
+from checks import check, run_scenarios
+from pyrogram.errors import FloodWait, MessageNotModified
+from modules.gemini_client import GeminiClient
+from modules.streaming import stream_reply, TELEGRAM_TEXT_LIMIT
+from gemini_stub import start_stub, payload
+
+
+class FakeSent:
+    """A sent message; records every edit and can be told to answer the next edits with FloodWait."""
+
+    def __init__(self, chat, text):
+        self.chat = chat
+        self.text = text
+        self.edits = []
+
+    async def edit_text(self, text):
+        loop = asyncio.get_running_loop()
+        if self.chat.flood_waits:
+            raise FloodWait(value=self.chat.flood_waits.pop(0))
+        if len(text) == TELEGRAM_TEXT_LIMIT and self.chat.flood_at_limit:
+            value, self.chat.flood_at_limit = self.chat.flood_at_limit, 0
+            raise FloodWait(value=value)
+        if text == self.text:
+            raise MessageNotModified()
+        self.text = text
+        self.edits.append(loop.time())
+
+
+class FakeMessage:
+    """The incoming message being answered; its replies land in self.replies."""
+
+    def __init__(self, fail_replies=False):
+        self.replies = []
+        self.reply_times = []
+        self.flood_waits = []
+        self.flood_at_limit = 0
+        self.fail_replies = fail_replies
+
+    async def reply_text(self, text):
+        if self.fail_replies:
+            raise RuntimeError("send failed")
+        self.reply_times.append(asyncio.get_running_loop().time())
+        self.replies.append(FakeSent(self, text))
+        return self.replies[-1]
+
+
+async def progressive(client):
+    """The first text goes out as soon as it arrives; later text is applied in throttled edits."""
+    text = ' '.join(f"word{n}" for n in range(200))
+    message = FakeMessage()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await stream_reply(message, client.stream(payload(text)), interval=0.2, min_chars=20)
+    elapsed = loop.time() - started
+    sent = message.replies[0] if message.replies else FakeSent(message, '')
+    gaps = [later - earlier for earlier, later in zip(sent.edits, sent.edits[1:])]
+    return all([
+        check(result == text and len(message.replies) == 1 and sent.text == text, "one reply ends with the full text"),
+        check(message.reply_times and message.reply_times[0] - started < 0.1,
+              f"first text is sent sub-second ({(message.reply_times or [started])[0] - started:.3f}s "
+              f"of a {elapsed:.2f}s stream)"),
+        check(1 <= len(sent.edits) <= elapsed / 0.2 + 1, f"edits are throttled ({len(sent.edits)} edits)"),
+        check(not gaps or min(gaps) >= 0.19, f"edits are at least 0.2s apart (min {min(gaps or [0]):.3f}s)"),
+    ])
+
+
+async def flood_wait(client):
+    """A FloodWait on an edit pauses edits for its duration; the final text still lands."""
+    text = 'x' * 400
+    message = FakeMessage()
+    message.flood_waits = [1]
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await stream_reply(message, client.stream(payload(text)), interval=0.05, min_chars=10)
+    sent = message.replies[0]
+    return all([
+        check(sent.text == text, "final text lands after the FloodWait"),
+        check(sent.edits and sent.edits[0] - started >= 1, f"no edit before the wait is over "
+              f"({(sent.edits or [started])[0] - started:.3f}s)"),
+    ])
+
+
+async def overflow(client):
+    """A reply longer than one message is split at the limit; each part is settled through the guarded edit."""
+    text = ''.join(chr(ord('a') + n % 26) for n in range(2 * TELEGRAM_TEXT_LIMIT + 500))
+    message = FakeMessage()
+    # The edit that completes the first part hits a FloodWait and must be retried, not raised
+    message.flood_at_limit = 1
+    result = await stream_reply(message, client.stream(payload(text)), interval=0.05, min_chars=10)
+    parts = [sent.text for sent in message.replies]
+    return all([
+        check(result == text, "the whole text is returned"),
+        check([len(part) for part in parts] == [TELEGRAM_TEXT_LIMIT, TELEGRAM_TEXT_LIMIT, 500],
+              f"split into messages at the limit ({[len(part) for part in parts]})"),
+        check(''.join(parts) == text, "the parts add up to the reply"),
+        check(not message.flood_at_limit, "the FloodWait on the completing edit was hit and waited out"),
+    ])
+
+
+async def send_failure(client):
+    """If sending fails the error reaches the caller and the HTTP stream is closed, freeing its pool thread."""
+    server, api_base = start_stub(chunks=8, chunk_delay=1.0)
+    slow = GeminiClient('test', api_base=api_base, max_concurrency=1)
+    try:
+        await stream_reply(FakeMessage(fail_replies=True), slow.stream(payload('y' * 80)))
+        raised = False
+    except RuntimeError:
+        raised = True
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    data = await asyncio.wait_for(slow.generate(payload('next')), timeout=10)
+    elapsed = loop.time() - started
+    slow.close()
+    server.shutdown()
+    return all([
+        check(raised, "the send error is raised"),
+        check(slow.extract_text(data) == 'next' and elapsed < 2.5,
+              f"the stream's pool thread is released long before the 8s stream ends ({elapsed:.2f}s)"),
+    ])
+
+
+async def main():
+    server, api_base = start_stub(chunks=40, chunk_delay=0.03)
+    client = GeminiClient('test', api_base=api_base)
+    passed = await run_scenarios((progressive, flood_wait, overflow, send_failure), client)
+    client.close()
+    server.shutdown()
+    return passed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(main()) else 1)